@@ -0,0 +1,150 @@
+import hashlib
+import json
+import pathlib
+import posixpath
+import re
+from critical_css import html_tags, inline_style, load_stylesheet, node_tags, stylesheet_links
+from images import image_suffixes
+from manifest import hash_file
+from template import Placeholder
+from sync import scan_files
+
+fingerprint_length = 10
+default_asset_manifest_name = "asset-manifest.json"
+# matches the names fingerprinted_name produces, so a server can mark them immutable
+fingerprint_pattern = re.compile(r"\.[0-9a-f]{%d}(\.[^./]+)?$" % fingerprint_length)
+url_attribute_pattern = re.compile(r"""(\s(?:href|src)=)(["'])([^"']*)\2""")
+
+def fingerprinted_name(relative_path, digest):
+    # images/rivendell.png -> images/rivendell.<digest>.png
+    path = pathlib.PurePosixPath(relative_path)
+    return str(path.with_name(f"{path.stem}.{digest[:fingerprint_length]}{path.suffix}"))
+
+class Assets:
+    # What the page rendering knows about the static files: the fingerprinted url of every file and, if images is
+    # given, the [width, height] of every image by url. Rewrites references in templates and in the links and
+    # images of the markdown. With stylesheets, {url: [path, hash]} of the css files, the stylesheets linked by a
+    # template are inlined into every page, cut down to the rules the page's tags can use.
+    def __init__(self, urls=None, images=None, stylesheets=None) -> None:
+        self.urls = urls or {}
+        self.images = images
+        self.stylesheets = stylesheets
+        self.version = hashlib.blake2b(json.dumps([self.urls, self.images, self.stylesheets], sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+        self.templates = {}
+
+    def __getstate__(self):
+        # the rewritten templates are rebuilt in every worker process
+        return {"urls": self.urls, "images": self.images, "stylesheets": self.stylesheets, "version": self.version, "templates": {}}
+
+    def url(self, url):
+        # a query or fragment is kept as it is
+        end = min((index for index in (url.find("?"), url.find("#")) if index != -1), default=len(url))
+        return self.urls.get(url[:end], url[:end]) + url[end:]
+
+    def image_props(self, url, alt):
+        props = {"src": self.url(url), "alt": alt}
+        if self.images is None:
+            return props
+        end = min((index for index in (url.find("?"), url.find("#")) if index != -1), default=len(url))
+        size = self.images.get(url[:end])
+        if size is not None:
+            # the browser reserves the space before the image arrives, so the layout does not shift
+            props["width"] = str(size[0])
+            props["height"] = str(size[1])
+        props["loading"] = "lazy"
+        props["decoding"] = "async"
+        return props
+
+    def cache_key(self, block):
+        # rendered blocks with links or images depend on the fingerprints, everything else can be shared
+        if "](" in block:
+            return f"{block}\0{self.version}"
+        return block
+
+    def rewrite_html(self, html):
+        return url_attribute_pattern.sub(lambda match: match.group(1) + match.group(2) + self.url(match.group(3)) + match.group(2), html)
+
+    def template(self, segments):
+        # load_template hands out the same list while the file is unchanged, so rewriting is done once per template
+        cached = self.templates.get(id(segments))
+        if cached is None or cached[0] is not segments:
+            rewritten = []
+            for segment in segments:
+                if isinstance(segment, Placeholder):
+                    rewritten.append(segment)
+                elif self.stylesheets:
+                    rewritten.extend(self.split_stylesheet_links(segment))
+                else:
+                    rewritten.append(self.rewrite_html(segment))
+            cached = self.templates[id(segments)] = (segments, rewritten)
+        return cached[1]
+
+    def split_stylesheet_links(self, html):
+        # every link to one of the stylesheets becomes a placeholder page_values fills, the link itself if it doesn't
+        pos = 0
+        for match, href in stylesheet_links(html):
+            if href not in self.stylesheets:
+                continue
+            if match.start() > pos:
+                yield self.rewrite_html(html[pos:match.start()])
+            yield Placeholder(f"stylesheet:{href}", self.rewrite_html(match.group()))
+            pos = match.end()
+        if pos < len(html):
+            yield self.rewrite_html(html[pos:])
+
+    def page_values(self, segments, html_node, values=None):
+        # values for a page of the rewritten template segments, html_node is None when the page's tags are unknown
+        # and the whole stylesheet is inlined
+        if not self.stylesheets:
+            return values
+        placeholders = [segment for segment in segments if isinstance(segment, Placeholder) and segment.name.startswith("stylesheet:")]
+        if not placeholders:
+            return values
+        tags = None
+        if html_node is not None:
+            tags = node_tags(html_node)
+            tags.update(html_tags("".join(segment for segment in segments if isinstance(segment, str))))
+        page_values = dict(values or {})
+        for placeholder in placeholders:
+            href = placeholder.name.removeprefix("stylesheet:")
+            page_values[placeholder.name] = inline_style(load_stylesheet(self.stylesheets[href][0]).subset(tags), self.url(href))
+        return page_values
+
+def scan_assets(static_dir_path, fingerprint=True, image_index=None, files=None, critical_css=False):
+    # with an images.ImageIndex the sizes of the images are looked up as well, files is a scan_files result to reuse,
+    # critical_css inlines the stylesheets into the pages
+    urls = {}
+    images = None if image_index is None else {}
+    stylesheets = {} if critical_css else None
+    image_paths = []
+    for relative_path in scan_files(static_dir_path) if files is None else files:
+        file_path = pathlib.Path(static_dir_path) / relative_path
+        file_hash = None
+        if fingerprint:
+            file_hash = hash_file(file_path)
+            urls["/" + relative_path] = "/" + fingerprinted_name(relative_path, file_hash)
+        if critical_css and file_path.suffix.lower() == ".css":
+            stylesheets["/" + relative_path] = [str(file_path), file_hash or hash_file(file_path)]
+        if image_index is not None and file_path.suffix.lower() in image_suffixes:
+            image_paths.append(file_path)
+            size = image_index.size(file_path)
+            if size is not None:
+                images["/" + relative_path] = list(size)
+    if image_index is not None:
+        image_index.prune(image_paths)
+    return Assets(urls, images, stylesheets)
+
+def save_asset_manifest(assets, dest_dir_path, name=default_asset_manifest_name):
+    manifest_path = pathlib.Path(dest_dir_path) / name
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(f".{name}.tmp")
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(assets.urls, manifest_file, indent=1, sort_keys=True)
+    tmp_path.replace(manifest_path)
+    return manifest_path
+
+def fingerprinted_path(assets, relative_path):
+    # destination of a static file relative to the output directory
+    if assets is None:
+        return relative_path
+    return posixpath.relpath(assets.url("/" + relative_path), "/")
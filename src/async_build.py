@@ -0,0 +1,71 @@
+import asyncio
+import concurrent.futures
+import os
+import pathlib
+from main import default_stream_threshold, find_page_jobs, generate_page, open_output, render_markdown_page, report_minified
+from minify import HtmlMinifier
+
+# pages in flight at once, which also bounds how many sources and rendered pages are held in memory
+default_concurrency = 16
+
+def read_source(from_path):
+    with open(from_path) as src_file:
+        return src_file.read()
+
+def write_output(dest_path, html, minify=False):
+    try:
+        with open_output(dest_path) as dest_file:
+            stream = HtmlMinifier(dest_file) if minify else dest_file
+            stream.write(html)
+            if minify:
+                stream.finish()
+    except Exception:
+        pathlib.Path(dest_path).unlink(missing_ok=True)
+        raise
+    if minify:
+        report_minified(dest_path, stream)
+
+def make_dirs(dir_paths):
+    for dir_path in dir_paths:
+        os.makedirs(dir_path, exist_ok=True)
+
+async def build_page(job, semaphore, io_executor, render_executor, values, stream_threshold, assets, minify):
+    from_path, template_path, dest_path = job
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+        size = await loop.run_in_executor(io_executor, os.path.getsize, from_path)
+        if stream_threshold is not None and size > stream_threshold:
+            # huge sources keep the low memory path, read and written by one io thread
+            await loop.run_in_executor(io_executor, generate_page, from_path, template_path, dest_path, values, False, None, stream_threshold, assets, minify)
+            return
+        markdown = await loop.run_in_executor(io_executor, read_source, from_path)
+        html = await loop.run_in_executor(render_executor, render_markdown_page, markdown, template_path, values, None, assets)
+        await loop.run_in_executor(io_executor, write_output, dest_path, html, minify)
+
+async def run_jobs(jobs, concurrency, io_executor, render_executor, values, stream_threshold, assets, minify):
+    loop = asyncio.get_running_loop()
+    # every output directory is created up front in one go instead of one mkdir call per page
+    await loop.run_in_executor(io_executor, make_dirs, sorted({pathlib.Path(dest_path).parent for _, _, dest_path in jobs}))
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(build_page(job, semaphore, io_executor, render_executor, values, stream_threshold, assets, minify) for job in jobs), return_exceptions=True)
+    return [(job[0], result) for job, result in zip(jobs, results) if isinstance(result, Exception)]
+
+def generate_pages_async(jobs, concurrency=default_concurrency, workers=1, values=None, stream_threshold=default_stream_threshold, assets=None, minify=False):
+    # Same output and error list as main.generate_pages, but reads, renders and writes of different pages overlap,
+    # which pays off when every file access has a high latency, e.g. on network mounts. Reads and writes run on
+    # a pool of concurrency threads, rendering on one thread or on workers processes.
+    jobs = list(jobs)
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        render_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    else:
+        render_executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as io_executor, render_executor:
+        errors = asyncio.run(run_jobs(jobs, concurrency, io_executor, render_executor, values, stream_threshold, assets, minify))
+    errors.sort(key=lambda failure: str(failure[0]))
+    return errors
+
+def generate_pages_async_recursive(content_dir_path, template_path, dest_dir_path, concurrency=default_concurrency, workers=1, values=None, stream_threshold=default_stream_threshold, assets=None, files=None, minify=False):
+    return generate_pages_async(find_page_jobs(content_dir_path, template_path, dest_dir_path, files), concurrency, workers, values, stream_threshold, assets, minify)
@@ -0,0 +1,85 @@
+import argparse
+import gc
+import re
+import tracemalloc
+
+from htmlnode import HTMLNode
+from textnode import TextNode
+from text_parser import markdown_to_html_node, text_to_textnodes
+
+# dict backed copies of the node classes, as they were before __slots__, to compare against
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None) -> None:
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+def synthetic_markdown(paragraphs):
+    blocks = ["# Memory benchmark"]
+    for i in range(paragraphs):
+        blocks.append(f"Paragraph {i} has **bold**, *italic* and `code` with a [link](/page/{i}) and ![an image](/images/{i}.png) in it.")
+        blocks.append(f"* item {i}\n* **bold item**\n* [linked item](/item/{i})")
+        blocks.append(f"> quoted *text* {i}")
+    return "\n\n".join(blocks)
+
+def html_nodes(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.children:
+            stack.extend(node.children)
+
+def copy_html_tree(root, html_class):
+    return [html_class(node.tag, node.value, None, node.props) for node in html_nodes(root)]
+
+def copy_text_nodes(text_nodes, text_class):
+    return [text_class(node.text, node.text_type, node.url) for node in text_nodes]
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+def report(name, count, current, peak):
+    print(f"{name:<24}{count:>10} nodes{current / count:>10.1f} bytes/node{current / 1024:>12.1f} KiB{peak / 1024:>12.1f} KiB peak")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory used by dict backed and slotted node classes")
+    parser.add_argument("--paragraphs", type=int, default=2000, help="number of paragraph/list/quote groups in the synthetic document")
+    args = parser.parse_args()
+
+    markdown = synthetic_markdown(args.paragraphs)
+    root = markdown_to_html_node(markdown)
+    inline_texts = [re.sub(r"^(#+|[*-]|>) ", "", line) for line in markdown.splitlines() if line]
+    text_nodes = [node for text in inline_texts for node in text_to_textnodes(text)]
+
+    # node copies share their strings and props with the parsed tree, so only the node objects are measured
+    for name, build in (
+        ("HTMLNode (dict)", lambda: copy_html_tree(root, DictHTMLNode)),
+        ("HTMLNode (slots)", lambda: copy_html_tree(root, HTMLNode)),
+        ("TextNode (dict)", lambda: copy_text_nodes(text_nodes, DictTextNode)),
+        ("TextNode (slots)", lambda: copy_text_nodes(text_nodes, TextNode)),
+    ):
+        nodes, current, peak = measure(build)
+        report(name, len(nodes), current, peak)
+        del nodes
+
+    tree, current, peak = measure(lambda: markdown_to_html_node(markdown))
+    report("full parse", sum(1 for _ in html_nodes(tree)), current, peak)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import pathlib
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from text_parser import block_to_block_type, markdown_to_blocks, markdown_to_html_node, scan_markdown, text_to_textnodes
+
+stages = ["read", "markdown_to_blocks", "block_to_block_type", "scan_markdown", "text_to_textnodes", "markdown_to_html_node", "to_html", "write"]
+default_mix = "paragraph=5,heading=1,unordered_list=2,ordered_list=1,code=1,quote=1"
+words = ["lorem", "ipsum", "dolor", "sit", "amet", "elf", "ring", "shire", "gandalf", "mordor", "river", "stone", "tower", "light", "shadow", "road"]
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def synthetic_inline(rng, word_count, inline_density):
+    # plain words with a share of inline_density of them wrapped in bold, italic, code, links or images
+    parts = []
+    for _ in range(word_count):
+        word = rng.choice(words)
+        if rng.random() < inline_density:
+            kind = rng.randrange(5)
+            if kind == 0:
+                word = f"**{word}**"
+            elif kind == 1:
+                word = f"*{word}*"
+            elif kind == 2:
+                word = f"`{word}`"
+            elif kind == 3:
+                word = f"[{word}](/{word}/{rng.randrange(1000)})"
+            else:
+                word = f"![{word}](/images/{word}.png)"
+        parts.append(word)
+    return " ".join(parts)
+
+def synthetic_block(rng, block_kind, inline_density):
+    if block_kind == "heading":
+        return "#" * rng.randint(2, 6) + " " + synthetic_inline(rng, rng.randint(2, 6), inline_density)
+    if block_kind == "unordered_list":
+        return "\n".join(f"{rng.choice('*-')} {synthetic_inline(rng, rng.randint(3, 12), inline_density)}" for _ in range(rng.randint(2, 8)))
+    if block_kind == "ordered_list":
+        return "\n".join(f"{number}. {synthetic_inline(rng, rng.randint(3, 12), inline_density)}" for number in range(1, rng.randint(3, 9)))
+    if block_kind == "code":
+        return "```\n" + "\n".join(" ".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(rng.randint(2, 10))) + "\n```"
+    if block_kind == "quote":
+        return "\n".join(f"> {synthetic_inline(rng, rng.randint(4, 14), inline_density)}" for _ in range(rng.randint(1, 4)))
+    return synthetic_inline(rng, rng.randint(20, 80), inline_density)
+
+def synthetic_page(rng, blocks=30, inline_density=0.1, mix=default_mix):
+    weights = parse_mix(mix)
+    kinds = list(weights)
+    chosen = rng.choices(kinds, weights=[weights[kind] for kind in kinds], k=blocks)
+    return "\n\n".join(["# " + synthetic_inline(rng, 4, 0)] + [synthetic_block(rng, kind, inline_density) for kind in chosen])
+
+def synthetic_corpus(pages=100, blocks=30, inline_density=0.1, mix=default_mix, seed=0):
+    rng = random.Random(seed)
+    return [synthetic_page(rng, blocks, inline_density, mix) for _ in range(pages)]
+
+def write_corpus(corpus, content_dir_path, pages_per_dir=50):
+    content_dir_path = pathlib.Path(content_dir_path)
+    for number, markdown in enumerate(corpus):
+        page_path = content_dir_path / f"section{number // pages_per_dir}" / f"page{number}.md"
+        page_path.parent.mkdir(parents=True, exist_ok=True)
+        page_path.write_text(markdown)
+
+def time_stages(page_paths, output_dir_path):
+    # seconds spent in each stage over the whole corpus
+    timings = dict.fromkeys(stages, 0.0)
+    clock = time.perf_counter
+    for number, page_path in enumerate(page_paths):
+        start = clock()
+        with open(page_path) as page_file:
+            markdown = page_file.read()
+        timings["read"] += clock() - start
+
+        start = clock()
+        blocks = markdown_to_blocks(markdown)
+        timings["markdown_to_blocks"] += clock() - start
+
+        start = clock()
+        for block in blocks:
+            block_to_block_type(block)
+        timings["block_to_block_type"] += clock() - start
+
+        start = clock()
+        scanned_blocks, _ = scan_markdown(markdown)
+        timings["scan_markdown"] += clock() - start
+
+        texts = [text for scanned_block in scanned_blocks for text in scanned_block.inline_texts]
+        start = clock()
+        for text in texts:
+            text_to_textnodes(text)
+        timings["text_to_textnodes"] += clock() - start
+
+        start = clock()
+        html_node = markdown_to_html_node(markdown)
+        timings["markdown_to_html_node"] += clock() - start
+
+        start = clock()
+        html = html_node.to_html()
+        timings["to_html"] += clock() - start
+
+        start = clock()
+        with open(pathlib.Path(output_dir_path) / f"page{number}.html", "w") as output_file:
+            output_file.write(html)
+        timings["write"] += clock() - start
+    return timings
+
+def run_benchmark(pages=100, blocks=30, inline_density=0.1, mix=default_mix, seed=0, repeat=5):
+    corpus = synthetic_corpus(pages, blocks, inline_density, mix, seed)
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        write_corpus(corpus, root / "content")
+        page_paths = sorted((root / "content").rglob("*.md"))
+        (root / "public").mkdir()
+        for _ in range(repeat):
+            runs.append(time_stages(page_paths, root / "public"))
+    results = {
+        "meta": {
+            "pages": pages, "blocks": blocks, "inline_density": inline_density, "mix": mix, "seed": seed, "repeat": repeat,
+            "bytes": sum(len(markdown) for markdown in corpus),
+            "python": platform.python_version(), "platform": platform.platform(),
+        },
+        "stages": {},
+    }
+    for stage in stages:
+        samples = [run[stage] for run in runs]
+        # the fastest run is the least disturbed by the rest of the machine, the median shows the spread
+        results["stages"][stage] = {"best_s": min(samples), "median_s": statistics.median(samples), "per_page_us": min(samples) / pages * 1e6}
+    return results
+
+def compare_results(baseline, current, threshold=0.1):
+    # (stage, baseline seconds, current seconds, ratio, regressed) for every stage in both results
+    rows = []
+    for stage, current_stage in current["stages"].items():
+        baseline_stage = baseline["stages"].get(stage)
+        if baseline_stage is None:
+            continue
+        ratio = current_stage["best_s"] / baseline_stage["best_s"] if baseline_stage["best_s"] else float("inf")
+        rows.append((stage, baseline_stage["best_s"], current_stage["best_s"], ratio, ratio > 1 + threshold))
+    return rows
+
+def print_results(results):
+    meta = results["meta"]
+    print(f"{meta['pages']} pages, {meta['bytes']} bytes, best of {meta['repeat']}")
+    for stage, timing in results["stages"].items():
+        print(f"{stage:<24}{timing['best_s'] * 1000:>10.2f} ms{timing['median_s'] * 1000:>10.2f} ms median{timing['per_page_us']:>10.1f} us/page")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the build stages on a synthetic corpus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    corpus_options = argparse.ArgumentParser(add_help=False)
+    corpus_options.add_argument("--pages", type=int, default=100)
+    corpus_options.add_argument("--blocks", type=int, default=30, help="blocks per page")
+    corpus_options.add_argument("--inline-density", type=float, default=0.1, help="share of words carrying inline markup")
+    corpus_options.add_argument("--mix", default=default_mix, help="block kind weights")
+    corpus_options.add_argument("--seed", type=int, default=0)
+
+    run_parser = subparsers.add_parser("run", parents=[corpus_options], help="time every stage and optionally save the results as JSON")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--output", help="JSON file for the results")
+    run_parser.add_argument("--baseline", help="JSON results to compare against")
+    run_parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before a stage counts as regressed")
+
+    generate_parser = subparsers.add_parser("generate", parents=[corpus_options], help="write the synthetic corpus as a content tree")
+    generate_parser.add_argument("content_dir")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two JSON results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before a stage counts as regressed")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        write_corpus(synthetic_corpus(args.pages, args.blocks, args.inline_density, args.mix, args.seed), args.content_dir)
+        return
+
+    if args.command == "run":
+        current = run_benchmark(args.pages, args.blocks, args.inline_density, args.mix, args.seed, args.repeat)
+        print_results(current)
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(current, output_file, indent=1)
+        if not args.baseline:
+            return
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    else:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(args.current) as current_file:
+            current = json.load(current_file)
+
+    corpus_keys = ["pages", "blocks", "inline_density", "mix", "seed"]
+    if any(baseline["meta"].get(key) != current["meta"].get(key) for key in corpus_keys):
+        print("Warning: the baseline was measured on a different corpus", file=sys.stderr)
+    regressed = False
+    for stage, baseline_s, current_s, ratio, stage_regressed in compare_results(baseline, current, args.threshold):
+        regressed = regressed or stage_regressed
+        print(f"{stage:<24}{baseline_s * 1000:>10.2f} ms ->{current_s * 1000:>10.2f} ms{(ratio - 1) * 100:>+8.1f}%{'  REGRESSION' if stage_regressed else ''}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import collections
+import hashlib
+import json
+import pathlib
+
+# bump whenever the html produced for a block changes, so fragments from older builds are dropped
+renderer_version = 1
+default_block_cache_path = ".block_cache.json"
+default_budget = 64 * 1024 * 1024
+
+def block_key(block):
+    return hashlib.blake2b(block.encode("utf-8"), digest_size=16).hexdigest()
+
+class BlockCache:
+    # rendered html fragments by hash of the raw markdown block, least recently used ones are evicted first
+    def __init__(self, budget=default_budget) -> None:
+        self.budget = budget
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, block):
+        key = block_key(block)
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def put(self, block, html):
+        key = block_key(block)
+        old_html = self.entries.pop(key, None)
+        if old_html is not None:
+            self.size -= entry_size(old_html)
+        self.entries[key] = html
+        self.size += entry_size(html)
+        self.evict()
+
+    def evict(self):
+        while self.size > self.budget and self.entries:
+            _, html = self.entries.popitem(last=False)
+            self.size -= entry_size(html)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"Block cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), {self.evictions} evictions, {len(self)} blocks, {self.size} bytes"
+
+def entry_size(html):
+    # the key is a fixed 32 character hex digest, the fragment dominates
+    return len(html.encode("utf-8")) + 32
+
+def load_block_cache(cache_path, budget=default_budget):
+    cache = BlockCache(budget)
+    cache_path = pathlib.Path(cache_path)
+    if not cache_path.is_file():
+        return cache
+    try:
+        with open(cache_path) as cache_file:
+            data = json.load(cache_file)
+    except (OSError, ValueError):
+        return cache
+    if data.get("version") != renderer_version:
+        return cache
+    # stored from least to most recently used, so replaying keeps the LRU order
+    for key, html in data.get("entries", []):
+        cache.entries[key] = html
+        cache.size += entry_size(html)
+    cache.evict()
+    cache.evictions = 0
+    return cache
+
+def save_block_cache(cache, cache_path):
+    cache_path = pathlib.Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with open(tmp_path, "w") as cache_file:
+        json.dump({"version": renderer_version, "entries": list(cache.entries.items())}, cache_file)
+    tmp_path.replace(cache_path)
@@ -0,0 +1,119 @@
+import bz2
+import concurrent.futures
+import gzip
+import os
+import pathlib
+import zlib
+from manifest import hash_file, load_manifest, save_manifest
+from sync import scan_files
+
+default_compress_manifest_path = ".compress_manifest.json"
+default_min_size = 256
+compressible_suffixes = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml"}
+
+# content coding -> (sidecar suffix, compress function), the names are the ones used in Accept-Encoding
+codecs = {
+    "gzip": (".gz", lambda data: gzip.compress(data, 9, mtime=0)),
+    "deflate": (".zz", lambda data: zlib.compress(data, 9)),
+    "bzip2": (".bz2", lambda data: bz2.compress(data, 9)),
+}
+
+class CompressResult:
+    def __init__(self) -> None:
+        self.compressed = []
+        self.unchanged = []
+        self.skipped = []
+        self.removed = []
+        self.saved = 0
+
+    def __repr__(self) -> str:
+        return f"CompressResult({len(self.compressed)} compressed, {len(self.unchanged)} unchanged, {len(self.skipped)} skipped, {len(self.removed)} removed, {self.saved} bytes saved)"
+
+def parse_codecs(names):
+    # "gzip,bzip2" -> ["gzip", "bzip2"]
+    codec_names = [name.strip() for name in names.split(",") if name.strip()]
+    for name in codec_names:
+        if name not in codecs:
+            raise Exception(f"Unknown compression codec {name}, expected one of {', '.join(codecs)}")
+    return codec_names
+
+def sidecar_suffixes(codec_names):
+    return [codecs[name][0] for name in codec_names]
+
+def write_sidecar(sidecar_path, data, mtime_ns):
+    # replaced rather than overwritten, the old sidecar may be a hardlink into the previous generation
+    tmp_path = sidecar_path.with_name(f".{sidecar_path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp_path, sidecar_path)
+
+def compress_file(file_path, codec_names, min_size):
+    # returns the suffixes of the sidecars written and the bytes the best of them saves
+    file_path = pathlib.Path(file_path)
+    stat = file_path.stat()
+    data = file_path.read_bytes() if stat.st_size >= min_size else b""
+    written = []
+    saved = 0
+    for name in codec_names:
+        suffix, compress = codecs[name]
+        sidecar_path = file_path.with_name(file_path.name + suffix)
+        compressed = compress(data) if data else None
+        if compressed is None or len(compressed) >= len(data):
+            continue
+        write_sidecar(sidecar_path, compressed, stat.st_mtime_ns)
+        written.append(suffix)
+        saved = max(saved, len(data) - len(compressed))
+    return written, saved
+
+def compress_tree(root, codec_names, manifest_path=default_compress_manifest_path, min_size=default_min_size, workers=None):
+    # Writes precompressed sidecars next to every compressible file below root. A file is only compressed again
+    # when its content changed since the last run, files with a matching size and mtime are not even hashed.
+    root = pathlib.Path(root)
+    old_manifest = load_manifest(manifest_path, "compressed")
+    new_manifest = {}
+    result = CompressResult()
+    files = scan_files(root)
+    jobs = []
+    # only sidecars the manifest lists are ever removed, a .gz file that isn't one of them is an asset like any other
+    for relative_path, entry in sorted(old_manifest.items()):
+        if relative_path not in files:
+            # the original is gone
+            for suffix in entry.get("sidecars", []):
+                sidecar_path = root / (relative_path + suffix)
+                if sidecar_path.is_file():
+                    sidecar_path.unlink()
+                    result.removed.append(sidecar_path)
+    for relative_path, stat in sorted(files.items()):
+        if pathlib.PurePosixPath(relative_path).suffix not in compressible_suffixes:
+            continue
+        entry = old_manifest.get(relative_path)
+        if entry is not None and entry.get("codecs") == codec_names and all((root / (relative_path + suffix)).is_file() for suffix in entry["sidecars"]):
+            if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns) or entry["hash"] == hash_file(root / relative_path):
+                for suffix in entry["sidecars"]:
+                    sidecar_path = root / (relative_path + suffix)
+                    if sidecar_path.stat().st_mtime_ns != stat.st_mtime_ns:
+                        # the file was written again with the same content, the server only serves a sidecar
+                        # with the mtime of its original
+                        write_sidecar(sidecar_path, sidecar_path.read_bytes(), stat.st_mtime_ns)
+                new_manifest[relative_path] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                result.unchanged.append(root / relative_path)
+                continue
+        jobs.append((relative_path, stat))
+
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    # zlib and bz2 release the GIL while compressing, so threads use every core
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for (relative_path, stat), (written, saved) in zip(jobs, executor.map(lambda job: compress_file(root / job[0], codec_names, min_size), jobs)):
+            # sidecars of the last run that no longer win or belong to a codec that is not configured any more
+            for suffix in set(old_manifest.get(relative_path, {}).get("sidecars", [])) - set(written):
+                (root / (relative_path + suffix)).unlink(missing_ok=True)
+            if written:
+                result.compressed.append(root / relative_path)
+                result.saved += saved
+            else:
+                result.skipped.append(root / relative_path)
+            new_manifest[relative_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_file(root / relative_path), "codecs": codec_names, "sidecars": written}
+
+    save_manifest(manifest_path, new_manifest, "compressed")
+    return result
@@ -0,0 +1,177 @@
+import os
+import re
+
+comment_pattern = re.compile(r"/\*.*?\*/", re.DOTALL)
+# braces, and the strings whose braces do not count
+brace_pattern = re.compile(r"""[{}]|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'""")
+space_pattern = re.compile(r"\s+")
+attribute_selector_pattern = re.compile(r"\[[^\]]*\]")
+parentheses_pattern = re.compile(r"\([^()]*\)")
+# a type selector starts a compound selector, after a combinator or at the start
+type_selector_pattern = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+html_tag_pattern = re.compile(r"<([a-zA-Z][\w-]*)")
+link_pattern = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+link_attribute_pattern = re.compile(r"""([\w-]+)\s*=\s*(["'])(.*?)\2""")
+# at-rules whose rules are filtered like the top level ones, any other at-rule is always kept
+group_at_rules = ("@media", "@supports", "@layer", "@container")
+
+# parsed stylesheets by path, invalidated when the file's mtime or size changes, so a build parses each one once
+stylesheet_cache = {}
+
+def split_selectors(prelude):
+    # splits a selector list at the commas outside of parentheses
+    selectors = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(prelude):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:index].strip())
+            start = index + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+def selector_tags(selector):
+    # the element names an element matched by selector or its ancestors must have, arguments like :not(p) don't count
+    selector = attribute_selector_pattern.sub("", selector)
+    while True:
+        stripped = parentheses_pattern.sub("", selector)
+        if stripped == selector:
+            break
+        selector = stripped
+    return frozenset(tag.lower() for tag in type_selector_pattern.findall(selector))
+
+class StyleRule:
+    __slots__ = ("selectors", "body")
+
+    def __init__(self, selectors, body) -> None:
+        # selectors are (selector, tags) pairs
+        self.selectors = selectors
+        self.body = body
+
+    def subset(self, tags):
+        # tags None keeps every selector
+        selectors = [selector for selector, selector_tags in self.selectors if tags is None or selector_tags <= tags]
+        if not selectors:
+            return ""
+        return ",".join(selectors) + "{" + self.body + "}"
+
+class GroupRule:
+    __slots__ = ("prelude", "rules")
+
+    def __init__(self, prelude, rules) -> None:
+        self.prelude = prelude
+        self.rules = rules
+
+    def subset(self, tags):
+        inner = "".join(rule.subset(tags) for rule in self.rules)
+        return f"{self.prelude}{{{inner}}}" if inner else ""
+
+class KeptRule:
+    __slots__ = ("text",)
+
+    def __init__(self, text) -> None:
+        self.text = text
+
+    def subset(self, tags):
+        return self.text
+
+def parse_rules(css):
+    rules = []
+    pos = 0
+    while True:
+        while pos < len(css) and css[pos].isspace():
+            pos += 1
+        if pos >= len(css):
+            return rules
+        open_brace = None
+        close_brace = len(css)
+        depth = 0
+        for match in brace_pattern.finditer(css, pos):
+            if match.group() == "{":
+                if open_brace is None:
+                    open_brace = match.start()
+                depth += 1
+            elif match.group() == "}" and open_brace is not None:
+                depth -= 1
+                if depth == 0:
+                    close_brace = match.start()
+                    break
+        semicolon = css.find(";", pos)
+        if css.startswith("@", pos) and semicolon != -1 and (open_brace is None or semicolon < open_brace):
+            # @import, @charset and the like
+            rules.append(KeptRule(space_pattern.sub(" ", css[pos:semicolon + 1])))
+            pos = semicolon + 1
+            continue
+        if open_brace is None:
+            return rules
+        prelude = space_pattern.sub(" ", css[pos:open_brace]).strip()
+        body = css[open_brace + 1:close_brace]
+        if prelude.lower().startswith(group_at_rules):
+            rules.append(GroupRule(prelude, parse_rules(body)))
+        elif prelude.startswith("@"):
+            rules.append(KeptRule(f"{prelude}{{{space_pattern.sub(' ', body).strip()}}}"))
+        else:
+            selectors = [(selector, selector_tags(selector)) for selector in split_selectors(prelude)]
+            rules.append(StyleRule(selectors, space_pattern.sub(" ", body).strip()))
+        pos = close_brace + 1
+
+class Stylesheet:
+    # the rules of a css file, subset() keeps the rules whose selectors can match a page made of the given tags
+    def __init__(self, css) -> None:
+        self.rules = parse_rules(comment_pattern.sub("", css))
+        self.subsets = {}
+
+    def subset(self, tags=None):
+        # every rule when tags is None, the subsets are remembered because most pages use the same few tag sets
+        key = None if tags is None else frozenset(tags)
+        css = self.subsets.get(key)
+        if css is None:
+            css = self.subsets[key] = "".join(rule.subset(key) for rule in self.rules)
+        return css
+
+def load_stylesheet(stylesheet_path):
+    stat = os.stat(stylesheet_path)
+    key = str(stylesheet_path)
+    cached = stylesheet_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    with open(stylesheet_path, encoding="utf-8") as stylesheet_file:
+        stylesheet = Stylesheet(stylesheet_file.read())
+    stylesheet_cache[key] = ((stat.st_mtime_ns, stat.st_size), stylesheet)
+    return stylesheet
+
+def node_tags(html_node):
+    tags = set()
+    stack = [html_node]
+    while stack:
+        node = stack.pop()
+        if node.tag:
+            tags.add(node.tag.lower())
+        elif node.value:
+            # raw html, like the fragments of a block cache
+            tags.update(html_tags(node.value))
+        if node.children:
+            stack.extend(node.children)
+    return tags
+
+def html_tags(html):
+    return {tag.lower() for tag in html_tag_pattern.findall(html)}
+
+def stylesheet_links(html):
+    # (match, href) of every <link rel="stylesheet"> for all media
+    for match in link_pattern.finditer(html):
+        attributes = {name.lower(): value for name, _, value in link_attribute_pattern.findall(match.group())}
+        if attributes.get("rel", "").lower() == "stylesheet" and "href" in attributes and attributes.get("media", "all").lower() == "all":
+            yield match, attributes["href"]
+
+def inline_style(css, url):
+    # the critical rules go into the head, the full stylesheet is preloaded and applied once loaded,
+    # browsers without scripts get the plain link
+    css = css.replace("</", "<\\/")
+    return (f"<style>{css}</style>"
+            f"<link rel=\"preload\" href=\"{url}\" as=\"style\" onload=\"this.onload=null;this.rel='stylesheet'\">"
+            f"<noscript><link href=\"{url}\" rel=\"stylesheet\"></noscript>")
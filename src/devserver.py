@@ -0,0 +1,205 @@
+import html
+import http.server
+import mimetypes
+import pathlib
+import threading
+import time
+import urllib.parse
+from block_cache import BlockCache
+from main import find_page_jobs, render_markdown_page
+from sync import scan_files
+
+livereload_path = "/__livereload"
+livereload_script = f"""<script>new EventSource("{livereload_path}").onmessage = () => location.reload();</script>"""
+
+def snapshot(paths):
+    # absolute path -> (mtime, size) for every watched file, a missing path simply has no entries
+    files = {}
+    for path in paths:
+        path = pathlib.Path(path)
+        if path.is_dir():
+            for relative_path, stat in scan_files(path).items():
+                files[str((path / relative_path).resolve())] = (stat.st_mtime_ns, stat.st_size)
+        elif path.is_file():
+            stat = path.stat()
+            files[str(path.resolve())] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def changed_paths(old_snapshot, new_snapshot):
+    changed = {path for path, state in new_snapshot.items() if old_snapshot.get(path) != state}
+    changed.update(path for path in old_snapshot if path not in new_snapshot)
+    return changed
+
+def inject_livereload(html):
+    position = html.rfind("</body>")
+    if position == -1:
+        return html + livereload_script
+    return html[:position] + livereload_script + html[position:]
+
+def error_page(from_path, error):
+    return f"<!DOCTYPE html><html><body><h1>Build error</h1><p>{html.escape(str(from_path))}</p><pre>{html.escape(str(error))}</pre></body></html>"
+
+class DevSite:
+    # The whole site kept in memory as url path -> (bytes, content type), rebuilt file by file on changes.
+    def __init__(self, content_dir_path, static_dir_path, template_path, values=None) -> None:
+        self.content_dir_path = pathlib.Path(content_dir_path)
+        self.static_dir_path = pathlib.Path(static_dir_path)
+        self.template_path = pathlib.Path(template_path)
+        self.values = values
+        self.files = {}
+        self.pages = {}
+        self.version = 0
+        self.condition = threading.Condition()
+        self.snapshot = {}
+        # unchanged blocks of an edited page are not parsed again
+        self.cache = BlockCache()
+
+    def watched_paths(self):
+        return [self.content_dir_path, self.static_dir_path, self.template_path]
+
+    def get(self, url_path):
+        with self.condition:
+            return self.files.get(url_path)
+
+    def load_asset(self, asset_path):
+        url_path = "/" + asset_path.relative_to(self.static_dir_path.resolve()).as_posix()
+        try:
+            data = asset_path.read_bytes()
+        except FileNotFoundError:
+            return url_path, None
+        content_type = mimetypes.guess_type(url_path)[0] or "application/octet-stream"
+        return url_path, (data, content_type)
+
+    def render(self, from_path, template_path):
+        try:
+            with open(from_path) as src_file:
+                html = render_markdown_page(src_file.read(), template_path, self.values, self.cache)
+        except Exception as error:
+            print(f"Error building {from_path}: {error}")
+            html = error_page(from_path, error)
+        return inject_livereload(html).encode("utf-8"), "text/html; charset=utf-8"
+
+    def rebuild(self, changed=None):
+        # changed is a set of absolute paths, None rebuilds everything
+        updates = {}
+        static_root = self.static_dir_path.resolve()
+        if changed is None:
+            changed_assets = [static_root / relative_path for relative_path in scan_files(static_root)] if static_root.is_dir() else []
+        else:
+            changed_assets = [pathlib.Path(path) for path in changed if static_root in pathlib.Path(path).parents]
+        for asset_path in changed_assets:
+            url_path, entry = self.load_asset(asset_path)
+            updates[url_path] = entry
+
+        # a page is rebuilt when its source, its template or the template it resolves to changed
+        pages = {}
+        for from_path, template_path, dest_path in find_page_jobs(self.content_dir_path, self.template_path, pathlib.PurePosixPath("/")):
+            from_key = str(pathlib.Path(from_path).resolve())
+            template_key = str(pathlib.Path(template_path).resolve())
+            url_path = pathlib.PurePosixPath(dest_path).as_posix()
+            pages[from_key] = (template_key, url_path)
+            if changed is None or from_key in changed or template_key in changed or self.pages.get(from_key) != (template_key, url_path):
+                print(f"Rebuilding {url_path} from {from_path}")
+                updates[url_path] = self.render(from_path, template_path)
+        for from_key, (_, url_path) in self.pages.items():
+            if from_key not in pages:
+                updates.setdefault(url_path, None)
+
+        with self.condition:
+            for url_path, entry in updates.items():
+                if entry is None:
+                    self.files.pop(url_path, None)
+                else:
+                    self.files[url_path] = entry
+            self.pages = pages
+            self.version += 1
+            self.condition.notify_all()
+        return sorted(updates)
+
+    def poll(self):
+        new_snapshot = snapshot(self.watched_paths())
+        changed = changed_paths(self.snapshot, new_snapshot)
+        self.snapshot = new_snapshot
+        if changed:
+            return self.rebuild(changed)
+        return []
+
+    def wait_for_change(self, version, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+def watch(site, interval=0.5, stop_event=None):
+    # polling works everywhere without extra dependencies, the watched trees are small enough to scan
+    while stop_event is None or not stop_event.is_set():
+        try:
+            site.poll()
+        except Exception as error:
+            print(f"Watch error: {error}")
+        time.sleep(interval)
+
+def handler_for(site):
+    class DevRequestHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # the site is keyed by decoded paths, like serve.resolve_path decodes them
+            url_path = urllib.parse.unquote(self.path.split("?", 1)[0].split("#", 1)[0])
+            if url_path == livereload_path:
+                return self.send_livereload()
+            entry = None
+            for candidate in (url_path, url_path.rstrip("/") + "/index.html", url_path + ".html"):
+                entry = site.get(candidate)
+                if entry is not None:
+                    break
+            if entry is None:
+                return self.send_body(404, b"Not found", "text/plain; charset=utf-8")
+            self.send_body(200, entry[0], entry[1])
+
+        def send_body(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_livereload(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            version = site.version
+            try:
+                while True:
+                    new_version = site.wait_for_change(version, 15)
+                    if new_version != version:
+                        self.wfile.write(b"data: reload\n\n")
+                        version = new_version
+                    else:
+                        self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return DevRequestHandler
+
+def serve_dev(content_dir_path, static_dir_path, template_path, port=8888, values=None, interval=0.5):
+    site = DevSite(content_dir_path, static_dir_path, template_path, values)
+    site.snapshot = snapshot(site.watched_paths())
+    site.rebuild()
+    threading.Thread(target=watch, args=(site, interval), daemon=True).start()
+    server = http.server.ThreadingHTTPServer(("", port), handler_for(site))
+    server.daemon_threads = True
+    print(f"Serving {content_dir_path} and {static_dir_path} on http://localhost:{port}, watching for changes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,4 +1,6 @@
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None) -> None:
         self.tag = tag
         self.value = value
@@ -7,6 +9,28 @@ class HTMLNode:
 
     def to_html(self):
         raise NotImplementedError
+
+    def html_parts(self):
+        # (opening html, children, closing html) used by iter_html, children None for nodes rendered in one piece
+        return self.to_html(), None, None
+
+    def iter_html(self):
+        # yields the html in fragments, walking the tree with an explicit stack instead of recursion
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+                continue
+            opening, children, closing = node.html_parts()
+            yield opening
+            if children:
+                stack.append(closing)
+                stack.extend(reversed(children))
+
+    def render_to(self, stream):
+        for fragment in self.iter_html():
+            stream.write(fragment)
     
     def props_to_html(self):
         result = ""
@@ -19,6 +43,8 @@ class HTMLNode:
         return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
     
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, value, tag=None, props=None) -> None:
         super().__init__(tag=tag, value=value, props=props)
 
@@ -30,15 +56,17 @@ class LeafNode(HTMLNode):
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
     
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, children, tag=None, props=None) -> None:
         super().__init__(tag, children=children, props=props)
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def html_parts(self):
         if not self.tag:
             raise ValueError("No tag provided")
         if not self.children:
             raise ValueError("ParentNode requires at least one child")
-        children_text = ""
-        for child in self.children:
-            children_text += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_text}</{self.tag}>"
\ No newline at end of file
+        return f"<{self.tag}{self.props_to_html()}>", self.children, f"</{self.tag}>"
@@ -0,0 +1,122 @@
+import json
+import os
+import pathlib
+import struct
+
+default_image_index_path = ".image_index.json"
+image_index_version = 1
+image_suffixes = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+# start of frame markers carrying the image size, all others but the standalone ones have a length to skip
+jpeg_sof_markers = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+jpeg_standalone_markers = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+def png_size(header):
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR" or len(header) < 24:
+        return None
+    return struct.unpack(">II", header[16:24])
+
+def gif_size(header):
+    if header[:6] not in (b"GIF87a", b"GIF89a") or len(header) < 10:
+        return None
+    return struct.unpack("<HH", header[6:10])
+
+def webp_size(header):
+    if header[:4] != b"RIFF" or header[8:12] != b"WEBP" or len(header) < 30:
+        return None
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and header[20] == 0x2F:
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+    return None
+
+def jpeg_size(image_file):
+    # walks the segments up to the first start of frame, never reading the compressed image data
+    if image_file.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        byte = image_file.read(1)
+        while byte and byte != b"\xff":
+            byte = image_file.read(1)
+        while byte == b"\xff":
+            byte = image_file.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in jpeg_standalone_markers:
+            continue
+        length_bytes = image_file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in jpeg_sof_markers:
+            frame = image_file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        if marker == 0xD9 or length < 2:
+            return None
+        image_file.seek(length - 2, os.SEEK_CUR)
+
+def image_size(image_path):
+    # (width, height) from the file header of a PNG, GIF, WebP or JPEG image, None for anything else
+    with open(image_path, "rb") as image_file:
+        header = image_file.read(32)
+        for read_size in (png_size, gif_size, webp_size):
+            size = read_size(header)
+            if size is not None:
+                return size
+        image_file.seek(0)
+        return jpeg_size(image_file)
+
+class ImageIndex:
+    # image sizes by path, an entry is reused as long as the file's mtime and size are the same
+    def __init__(self) -> None:
+        self.entries = {}
+        self.changed = False
+
+    def size(self, image_path):
+        stat = os.stat(image_path)
+        key = str(image_path)
+        entry = self.entries.get(key)
+        if entry is not None and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return tuple(entry[2]) if entry[2] else None
+        try:
+            size = image_size(image_path)
+        except (OSError, struct.error):
+            size = None
+        self.entries[key] = [stat.st_mtime_ns, stat.st_size, list(size) if size else None]
+        self.changed = True
+        return size
+
+    def prune(self, image_paths):
+        keep = {str(image_path) for image_path in image_paths}
+        for key in [key for key in self.entries if key not in keep]:
+            del self.entries[key]
+            self.changed = True
+
+def load_image_index(index_path=default_image_index_path):
+    index = ImageIndex()
+    try:
+        with open(index_path) as index_file:
+            data = json.load(index_file)
+    except (OSError, ValueError):
+        return index
+    if data.get("version") == image_index_version:
+        index.entries = data.get("images", {})
+    return index
+
+def save_image_index(index, index_path=default_image_index_path):
+    if not index.changed:
+        return
+    index_path = pathlib.Path(index_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp_path, "w") as index_file:
+        json.dump({"version": image_index_version, "images": index.entries}, index_file, indent=1, sort_keys=True)
+    tmp_path.replace(index_path)
+    index.changed = False
@@ -0,0 +1,54 @@
+import json
+import time
+
+page_stages = ["read", "blocks", "cache", "inline", "tree", "serialize", "template", "minify", "write"]
+
+class StageTimer:
+    # lap style timer: every lap books the time since the previous lap on the given stage
+    __slots__ = ("stages", "last")
+
+    def __init__(self) -> None:
+        self.stages = {}
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+class NullTimer:
+    # stands in for StageTimer when instrumentation is off, so the build code never has to check
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+null_timer = NullTimer()
+
+def summarize(page_timings):
+    # page_timings is a list of (source, {stage: seconds}), returns the pages sorted slowest first and the stage totals
+    pages = sorted(({"source": str(source), "total": sum(stages.values()), "stages": stages} for source, stages in page_timings), key=lambda page: page["total"], reverse=True)
+    totals = {}
+    for page in pages:
+        for stage, seconds in page["stages"].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    totals = dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+    return pages, totals
+
+def format_report(page_timings, top=10):
+    pages, totals = summarize(page_timings)
+    build_total = sum(totals.values())
+    lines = [f"Build report: {len(pages)} pages, {build_total * 1000:.1f} ms in page stages", "", "Hottest stages:"]
+    for stage, seconds in totals.items():
+        share = seconds / build_total * 100 if build_total else 0.0
+        lines.append(f"  {stage:<14}{seconds * 1000:>10.2f} ms{share:>7.1f}%")
+    lines += ["", f"Slowest pages (top {min(top, len(pages))}):"]
+    for page in pages[:top]:
+        hottest = max(page["stages"], key=page["stages"].get) if page["stages"] else "-"
+        lines.append(f"  {page['total'] * 1000:>10.2f} ms  {page['source']}  (mostly {hottest})")
+    return "\n".join(lines)
+
+def write_report_json(page_timings, report_path):
+    pages, totals = summarize(page_timings)
+    with open(report_path, "w") as report_file:
+        json.dump({"stages": totals, "pages": pages}, report_file, indent=1)
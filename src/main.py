@@ -1,68 +1,537 @@
+import argparse
+import concurrent.futures
+import contextlib
+import cProfile
+import io
+import os
 import pathlib
+import posixpath
 import shutil
-from text_parser import extract_title, markdown_to_html_node
+import stat
+import sys
+from assets import default_asset_manifest_name, fingerprinted_path, save_asset_manifest, scan_assets
+from block_cache import default_block_cache_path, default_budget, load_block_cache, save_block_cache
+from compress import compress_tree, default_compress_manifest_path, default_min_size, parse_codecs, sidecar_suffixes
+from images import default_image_index_path, load_image_index, save_image_index
+from instrument import StageTimer, format_report, null_timer, write_report_json
+from memory import MemoryBudgetExceeded, MemoryReport, format_memory_report, over_budget_actions, write_memory_report_json
+from minify import HtmlMinifier
+from manifest import hash_file, is_up_to_date, load_manifest, manifest_entry, save_manifest
+from search import build_search_index, default_search_manifest_path
+from shard import MergeError, default_shard_dir, merge_shards, parse_shard, prepare_shard, shard_files, write_shard_manifest
+from staging import default_generations_dir, prepare_staging, prune_tree, swap_in
+from sync import default_asset_manifest_path, default_ignore_patterns, remove_output, scan_files, sync_from_to
+from template import layout_file_name, load_template, render_template, resolve_layout
+from text_parser import find_title, iter_scanned_blocks, parse_markdown, render_blocks_to
 
-def copy_from_to(src, dest):
+default_manifest_path = ".build_manifest.json"
+# sources larger than this are streamed block by block instead of being parsed as a whole, None never streams
+default_stream_threshold = 32 * 1024 * 1024
+
+class BuildError(Exception):
+    def __init__(self, errors) -> None:
+        self.errors = errors
+        details = "\n".join(f"  {from_path}: {error}" for from_path, error in errors)
+        super().__init__(f"{len(errors)} page(s) failed to build:\n{details}")
+
+def copy_from_to(src, dest, clean=True, assets=None, url_dir="/", files=None):
+    # with assets every file is copied under its fingerprinted name, url_dir is the url of dest while recursing
+    # files is a scan_files result of src, copied without walking src again
     # Preparation steps
     src_path = pathlib.Path(src)
     if not src_path.exists() or not src_path.is_dir():
         raise Exception("Invalid source directory for copy operations")
     # check if dest exists already, to either delete all content or create the full path
     dest_path = pathlib.Path(dest)
-    if dest_path.exists():
+    if clean and dest_path.is_symlink():
+        # left behind by an atomic build, the live generation itself stays untouched
+        dest_path.unlink()
+    elif clean and dest_path.exists():
         shutil.rmtree(dest)
     pathlib.Path(dest).mkdir(parents=True, exist_ok=True)
 
+    if files is not None:
+        for relative_path in sorted(files):
+            dest_file_path = dest_path / (relative_path if assets is None else assets.url("/" + relative_path)[1:])
+            dest_file_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(src_path / relative_path, dest_file_path)
+        return
 
     for file_dir in src_path.iterdir():
         if file_dir.is_file():
-            shutil.copy(file_dir, dest_path)
+            if assets is None:
+                shutil.copy(file_dir, dest_path)
+            else:
+                shutil.copy(file_dir, dest_path / posixpath.basename(assets.url(url_dir + file_dir.name)))
         elif file_dir.is_dir():
             new_dest_path = dest_path.joinpath(file_dir.name)
-            copy_from_to(file_dir, new_dest_path)
+            copy_from_to(file_dir, new_dest_path, clean=clean, assets=assets, url_dir=url_dir + file_dir.name + "/")
+
+@contextlib.contextmanager
+def open_output(dest_path):
+    # written under a temporary name and renamed over dest_path when complete, so a hardlinked copy of the
+    # previous version, as kept by atomic builds, is replaced instead of being overwritten in place
+    dest_path = pathlib.Path(dest_path)
+    tmp_path = dest_path.with_name(f".{dest_path.name}.tmp")
+    try:
+        with open(tmp_path, "w") as dest_file:
+            yield dest_file
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, dest_path)
+
+def stat_file(path):
+    # a single stat with the errors of the exists() and is_file() checks it replaces
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        raise Exception(f"Source file: {path} does not exist")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Exception(f"{path} is not a file")
+    return file_stat
 
-def generate_page(from_path, template_path, dest_path):
+def report_minified(dest_path, minifier):
+    print(f"Minified {dest_path}, {minifier.saved} of {minifier.size_in} bytes saved")
+
+def generate_page(from_path, template_path, dest_path, values=None, instrument=False, cache=None, stream_threshold=default_stream_threshold, assets=None, minify=False, memory=None):
+    # returns {stage: seconds} when instrument is set, None otherwise
+    # with a memory.MemoryReport the peak memory of every stage is recorded and checked against its budget
     from_path = pathlib.Path(from_path)
-    if not from_path.exists():
-        raise Exception(f"Source file: {from_path} does not exist")
-    if not from_path.is_file():
-        raise Exception(f"{from_path} is not a file")
+    from_stat = stat_file(from_path)
     template_path = pathlib.Path(template_path)
-    if not template_path.exists():
-        raise Exception(f"Source file: {template_path} does not exist")
-    if not template_path.is_file():
-        raise Exception(f"{template_path} is not a file")
+    template_stat = stat_file(template_path)
 
     dest_path = pathlib.Path(dest_path)
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
 
+    timer = StageTimer() if instrument else null_timer
+    streamed = stream_threshold is not None and from_stat.st_size > stream_threshold
+    if memory is None:
+        write_page(from_path, template_path, template_stat, dest_path, values, timer, instrument, cache, streamed, assets, minify)
+        return timer.stages if instrument else None
+
+    page_memory = memory.track(timer)
+    try:
+        write_page(from_path, template_path, template_stat, dest_path, values, page_memory, instrument, cache, streamed, assets, minify)
+    except MemoryBudgetExceeded as error:
+        if streamed or memory.over_budget != "stream":
+            memory.add(from_path, page_memory, streamed)
+            dest_path.unlink(missing_ok=True)
+            raise Exception(str(error))
+        # only the low memory attempt is reported
+        print(f"{from_path}: {error}, building it again on the streaming path")
+        streamed = True
+        page_memory = memory.track(timer)
+        try:
+            generate_page_streaming(from_path, template_path, dest_path, values, page_memory, cache, assets, minify)
+        except MemoryBudgetExceeded as error:
+            memory.add(from_path, page_memory, streamed)
+            dest_path.unlink(missing_ok=True)
+            raise Exception(f"{error} on the streaming path as well")
+    memory.add(from_path, page_memory, streamed)
+    return timer.stages if instrument else None
+
+def write_page(from_path, template_path, template_stat, dest_path, values, timer, instrument, cache, streamed, assets, minify):
+    if streamed:
+        generate_page_streaming(from_path, template_path, dest_path, values, timer, cache, assets, minify)
+        return
     with open(from_path) as src_file:
-        with open(template_path) as template_file:
-            markdown = src_file.read()
-            template = template_file.read()
-            html_content = markdown_to_html_node(markdown).to_html()
-            title = extract_title(markdown)
-            template = template.replace("{{ Title }}", title)
-            template = template.replace("{{ Content }}", html_content)
-            
-            pathlib.Path(dest_path.parent).mkdir(parents=True, exist_ok=True)
-            with open(dest_path, "w") as dest_file:
-                dest_file.write(template)
-
-def generate_pages_recursive(content_dir_path, template_path, dest_dir_path):
+        markdown = src_file.read()
+    timer.lap("read")
+    template = load_template(template_path, template_stat)
+    if assets is not None:
+        template = assets.template(template)
+    timer.lap("template")
+    html_node, title = parse_markdown(markdown, timer, cache, assets)
+    if title is None:
+        raise Exception("No valid <h1>/# Header found")
+    if assets is not None:
+        values = assets.page_values(template, html_node, values)
+
+    pathlib.Path(dest_path.parent).mkdir(parents=True, exist_ok=True)
+    try:
+        if instrument:
+            # serialization and template fill are done one after the other, so each can be timed on its own
+            content = html_node.to_html()
+            timer.lap("serialize")
+            page = io.StringIO()
+            render_page(template, title, content, page, values)
+            timer.lap("template")
+            if minify:
+                minified = io.StringIO()
+                minifier = HtmlMinifier(minified)
+                minifier.write(page.getvalue())
+                minifier.finish()
+                page = minified
+                timer.lap("minify")
+            with open_output(dest_path) as dest_file:
+                dest_file.write(page.getvalue())
+            timer.lap("write")
+            if minify:
+                report_minified(dest_path, minifier)
+            return
+        with open_output(dest_path) as dest_file:
+            # the content is streamed into the file instead of being built as one string first
+            stream = HtmlMinifier(dest_file) if minify else dest_file
+            render_page(template, title, html_node.render_to, stream, values)
+            if minify:
+                stream.finish()
+        timer.lap("write")
+        if minify:
+            report_minified(dest_path, stream)
+    except Exception:
+        # never leave a half written page behind
+        dest_path.unlink(missing_ok=True)
+        raise
+
+def generate_page_streaming(from_path, template_path, dest_path, values=None, timer=null_timer, cache=None, assets=None, minify=False):
+    # Low memory path for huge sources: the file is read line by line and every block is written as soon as it
+    # is rendered, so only the largest block is ever held in memory. The title slot usually comes before the
+    # content, so a first pass reads up to the first "# " heading.
+    with open(from_path) as src_file:
+        title = find_title(iter_scanned_blocks(src_file))
+    timer.lap("blocks")
+    if title is None:
+        raise Exception("No valid <h1>/# Header found")
+    template = load_template(template_path)
+    if assets is not None:
+        # the page's tags are only known once it is written, so the whole stylesheet is inlined
+        template = assets.template(template)
+        values = assets.page_values(template, None, values)
+    timer.lap("template")
+
+    def write_content(stream):
+        with open(from_path) as src_file:
+            render_blocks_to(iter_scanned_blocks(src_file), stream, cache, assets)
+
+    pathlib.Path(dest_path.parent).mkdir(parents=True, exist_ok=True)
+    try:
+        with open_output(dest_path) as dest_file:
+            stream = HtmlMinifier(dest_file) if minify else dest_file
+            render_page(template, title, write_content, stream, values)
+            if minify:
+                stream.finish()
+    except Exception:
+        dest_path.unlink(missing_ok=True)
+        raise
+    timer.lap("write")
+    if minify:
+        report_minified(dest_path, stream)
+
+def render_page(template, title, content, stream, values=None):
+    # content is the html string or a callable writing it into the stream
+    page_values = dict(values or {})
+    page_values["Title"] = title
+    page_values["Content"] = content
+    render_template(template, page_values, stream)
+
+def render_markdown_page(markdown, template_path, values=None, cache=None, assets=None):
+    stream = io.StringIO()
+    html_node, title = parse_markdown(markdown, cache=cache, assets=assets)
+    if title is None:
+        raise Exception("No valid <h1>/# Header found")
+    template = load_template(template_path)
+    if assets is not None:
+        template = assets.template(template)
+        values = assets.page_values(template, html_node, values)
+    render_page(template, title, html_node.render_to, stream, values)
+    return stream.getvalue()
+
+def find_pages(content_dir_path, dest_dir_path, files=None):
+    # yields (source, destination) pairs for every markdown file below content_dir_path
+    # files is a scan_files result of content_dir_path, used instead of walking the directory
     content_dir_path = pathlib.Path(content_dir_path)
     dest_dir_path = pathlib.Path(dest_dir_path)
+    if files is not None:
+        for relative_path in sorted(files):
+            if posixpath.basename(relative_path) != layout_file_name:
+                yield content_dir_path / relative_path, (dest_dir_path / relative_path).with_suffix(".html")
+        return
     if content_dir_path.exists() and content_dir_path.is_dir():
         for file_dir in content_dir_path.iterdir():
             if file_dir.is_file():
-                generate_page(file_dir, template_path, dest_dir_path.joinpath(file_dir.name).with_suffix(".html"))
+                if file_dir.name == layout_file_name:
+                    continue
+                yield file_dir, dest_dir_path.joinpath(file_dir.name).with_suffix(".html")
             elif file_dir.is_dir():
-                generate_pages_recursive(file_dir, template_path, dest_dir_path.joinpath(file_dir.name))
+                yield from find_pages(file_dir, dest_dir_path.joinpath(file_dir.name))
+
+def find_page_jobs(content_dir_path, template_path, dest_dir_path, files=None):
+    # yields (source, template, destination) for every page, using the directory's layout.html if there is one
+    for from_path, dest_path in find_pages(content_dir_path, dest_dir_path, files):
+        yield from_path, resolve_layout(from_path, content_dir_path, template_path, files), dest_path
+
+def generate_pages_recursive(content_dir_path, template_path, dest_dir_path, values=None, timings=None, cache=None, stream_threshold=default_stream_threshold, assets=None, files=None, minify=False, memory=None):
+    # timings, if given, is a list that collects (source, {stage: seconds}) for every page
+    for from_path, page_template_path, dest_path in find_page_jobs(content_dir_path, template_path, dest_dir_path, files):
+        stages = generate_page(from_path, page_template_path, dest_path, values, timings is not None, cache, stream_threshold, assets, minify, memory)
+        if timings is not None:
+            timings.append((from_path, stages))
+
+def generate_pages(jobs, workers=1, values=None, timings=None, cache=None, stream_threshold=default_stream_threshold, assets=None, minify=False, memory=None):
+    # runs generate_page for every (source, template, destination) job and returns the failed ones as (source, error)
+    # a failing page never stops the remaining jobs, the block cache and memory report are only used when pages are
+    # built in this process
+    errors = []
+    instrument = timings is not None
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for from_path, template_path, dest_path in jobs:
+            try:
+                stages = generate_page(from_path, template_path, dest_path, values, instrument, cache, stream_threshold, assets, minify, memory)
+            except Exception as error:
+                errors.append((from_path, error))
+                continue
+            if instrument:
+                timings.append((from_path, stages))
+        return errors
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate_page, from_path, template_path, dest_path, values, instrument, None, stream_threshold, assets, minify): from_path for from_path, template_path, dest_path in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                stages = future.result()
+            except Exception as error:
+                errors.append((futures[future], error))
+                continue
+            if instrument:
+                timings.append((futures[future], stages))
+    errors.sort(key=lambda failure: str(failure[0]))
+    return errors
+
+def generate_pages_parallel(content_dir_path, template_path, dest_dir_path, workers=None, values=None, timings=None, cache=None, stream_threshold=default_stream_threshold, assets=None, files=None, minify=False, memory=None):
+    return generate_pages(list(find_page_jobs(content_dir_path, template_path, dest_dir_path, files)), workers, values, timings, cache, stream_threshold, assets, minify, memory)
+
+def hash_template(template_path, values=None, assets=None, minify=False):
+    # the template values, asset fingerprints and minification are part of the template's identity, changing one has to rebuild every page
+    template_hash = hash_file(template_path)
+    if values:
+        template_hash += ";" + ";".join(f"{name}={value}" for name, value in sorted(values.items()))
+    if assets is not None:
+        template_hash += f";assets={assets.version}"
+    if minify:
+        template_hash += ";minify"
+    return template_hash
+
+def generate_pages_incremental(content_dir_path, template_path, dest_dir_path, manifest_path=default_manifest_path, workers=1, values=None, timings=None, cache=None, stream_threshold=default_stream_threshold, assets=None, files=None, minify=False, memory=None, pending_manifest=None):
+    # only regenerates pages whose source, template or destination changed since the last build
+    # with pending_manifest, a dict, the new manifest goes there instead of to manifest_path and only when every
+    # page succeeded: an atomic build saves it once the staging directory is live, a failed one never does
+    old_manifest = load_manifest(manifest_path)
+    new_manifest = {}
+    template_hashes = {}
+    jobs = []
+    for from_path, page_template_path, dest_path in find_page_jobs(content_dir_path, template_path, dest_dir_path, files):
+        if page_template_path not in template_hashes:
+            template_hashes[page_template_path] = hash_template(page_template_path, values, assets, minify)
+        template_hash = template_hashes[page_template_path]
+        source_hash = hash_file(from_path)
+        if not is_up_to_date(old_manifest.get(str(from_path)), source_hash, template_hash, dest_path):
+            jobs.append((from_path, page_template_path, dest_path))
+        new_manifest[str(from_path)] = manifest_entry(source_hash, template_hash, dest_path)
+
+    errors = generate_pages(jobs, workers, values, timings, cache, stream_threshold, assets, minify, memory)
+    # failed pages are left out of the manifest so the next build retries them
+    for from_path, _ in errors:
+        del new_manifest[str(from_path)]
+    generated = [dest_path for from_path, _, dest_path in jobs if str(from_path) in new_manifest]
+
+    current_dests = {entry["dest"] for entry in new_manifest.values()}
+    for source, entry in old_manifest.items():
+        if source not in new_manifest and entry.get("dest") not in current_dests:
+            print(f"Removing stale page {entry['dest']}")
+            remove_output(entry["dest"], dest_dir_path)
+
+    if pending_manifest is None:
+        save_manifest(manifest_path, new_manifest)
+    elif not errors:
+        pending_manifest.update(new_manifest)
+    if errors:
+        raise BuildError(errors)
+    return generated
 
 
 def main():
-    copy_from_to("static", "public")
-    generate_pages_recursive("content/", "template.html", "public/")
+    parser = argparse.ArgumentParser(description="Generate the static site from content/ and static/ into public/")
+    parser.add_argument("--incremental", action="store_true", help="only rebuild pages whose inputs changed since the last build")
+    parser.add_argument("--manifest", default=default_manifest_path, help="path of the incremental build manifest")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes generating pages, 0 uses every CPU core")
+    parser.add_argument("--sync", action="store_true", help="only copy changed static files instead of recreating public/, implied by --incremental")
+    parser.add_argument("--checksum", action="store_true", help="compare file contents when size matches but the modification time differs")
+    parser.add_argument("--hardlink", action="store_true", help="hardlink static files into public/ instead of copying where possible")
+    parser.add_argument("--copy-workers", type=int, default=8, help="number of threads copying static files")
+    parser.add_argument("--watch", action="store_true", help="serve the site from memory, rebuild changed files and reload open browsers")
+    parser.add_argument("--port", type=int, default=8888, help="port used by --watch")
+    parser.add_argument("--report", action="store_true", help="time every page stage and print the slowest pages and hottest stages")
+    parser.add_argument("--report-json", metavar="FILE", help="write the per page stage timings as JSON, implies timing")
+    parser.add_argument("--profile", metavar="FILE", help="write cProfile stats of the build, pages built by --workers processes are not included")
+    parser.add_argument("--block-cache", nargs="?", const=default_block_cache_path, metavar="FILE", help=f"reuse rendered blocks across builds, stored in FILE (default {default_block_cache_path}), only used with --workers 1")
+    parser.add_argument("--block-cache-budget", type=int, default=default_budget, metavar="BYTES", help="size limit of the block cache")
+    parser.add_argument("--stream-threshold", type=int, default=default_stream_threshold, metavar="BYTES", help="stream sources larger than BYTES block by block to keep memory low, 0 streams every page")
+    parser.add_argument("--async-io", action="store_true", help="overlap reading, rendering and writing of pages, for content on high latency storage")
+    parser.add_argument("--io-concurrency", type=int, default=16, metavar="N", help="pages read and written at once with --async-io")
+    parser.add_argument("--atomic", action="store_true", help="build into a staging copy of public/ and swap it in only when every page succeeded")
+    parser.add_argument("--keep-generations", type=int, default=1, metavar="N", help="previous generations kept on disk by --atomic")
+    parser.add_argument("--compress", nargs="?", const="gzip", metavar="CODECS", help="write precompressed sidecars of the output, CODECS is a comma separated list of gzip, deflate and bzip2 (default gzip)")
+    parser.add_argument("--compress-min-size", type=int, default=default_min_size, metavar="BYTES", help="files smaller than this are not compressed")
+    parser.add_argument("--fingerprint", action="store_true", help=f"copy static files under content hashed names, rewrite the references to them and write {default_asset_manifest_name}")
+    parser.add_argument("--image-sizes", action="store_true", help="give images their width and height from the image files and load them lazily")
+    parser.add_argument("--critical-css", action="store_true", help="inline the rules of the linked stylesheets the tags of each page can use into its head and load the full stylesheets deferred")
+    parser.add_argument("--search", action="store_true", help="write a prefix sharded full text search index of the pages to public/search/")
+    parser.add_argument("--minify", action="store_true", help="collapse the whitespace between tags and in the text of every page, outside pre, textarea, script and style")
+    parser.add_argument("--memory-report", nargs="?", const="", metavar="FILE", help="trace the peak memory of every page stage and print the worst pages, FILE gets every page as JSON, only with --workers 1")
+    parser.add_argument("--memory-budget", type=int, metavar="BYTES", help="peak memory a page may use in any stage, implies --memory-report")
+    parser.add_argument("--over-budget", choices=over_budget_actions, default="fail", help="fail a page over the memory budget or build it again on the low memory streaming path (default fail)")
+    parser.add_argument("--ignore", action="append", default=[], metavar="PATTERN", help="leave out files and directories matching PATTERN, in addition to editor and temporary files")
+    parser.add_argument("--shard", metavar="I/N", help="build only shard I of N, a share of the pages balanced by source size, into SHARD_DIR/I/, shard 1 also copies the static files")
+    parser.add_argument("--shard-dir", default=default_shard_dir, help=f"where --shard writes and --merge-shards reads the shards (default {default_shard_dir})")
+    parser.add_argument("--merge-shards", action="store_true", help="check that the shards in SHARD_DIR cover every page exactly once and combine them into public/")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="fill the template placeholder {{ NAME }} with VALUE on every page")
+    args = parser.parse_args()
+
+    values = {}
+    for assignment in args.set:
+        name, separator, value = assignment.partition("=")
+        if not separator:
+            parser.error(f"--set expects NAME=VALUE, got {assignment}")
+        values[name.strip()] = value
+
+    if args.async_io:
+        # the async pipeline neither times its pages nor uses the block cache
+        for flag, name in ((args.incremental, "--incremental"), (args.report, "--report"), (args.report_json, "--report-json"), (args.block_cache, "--block-cache")):
+            if flag:
+                parser.error(f"--async-io cannot be combined with {name}")
+    memory = None
+    if args.memory_report is not None or args.memory_budget is not None:
+        if args.async_io or args.workers != 1:
+            parser.error("--memory-report and --memory-budget measure pages built one at a time, without --async-io and with --workers 1")
+        memory = MemoryReport(args.memory_budget, args.over_budget)
+
+    shard_index = shard_count = None
+    if args.shard:
+        try:
+            shard_index, shard_count = parse_shard(args.shard)
+        except Exception as error:
+            parser.error(str(error))
+    if args.shard or args.merge_shards:
+        for flag, name in ((args.incremental, "--incremental"), (args.atomic, "--atomic"), (args.watch, "--watch"), (args.shard and args.merge_shards, "--merge-shards")):
+            if flag:
+                parser.error(f"{name} cannot be combined with {'--shard' if args.shard else '--merge-shards'}")
+        if args.shard and (args.search or args.compress):
+            parser.error("--search and --compress need every page, use them with --merge-shards")
+
+    codec_names = []
+    if args.compress:
+        try:
+            codec_names = parse_codecs(args.compress)
+        except Exception as error:
+            parser.error(str(error))
+
+    if args.watch:
+        import devserver
+        devserver.serve_dev("content/", "static", "template.html", args.port, values)
+        return
+
+    timings = [] if args.report or args.report_json else None
+    cache = load_block_cache(args.block_cache, args.block_cache_budget) if args.block_cache else None
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        if args.shard:
+            dest_dir = prepare_shard(args.shard_dir, shard_index)
+        else:
+            # atomic builds write into a staging copy of the live site, the unchanged files in it are hardlinks
+            dest_dir = prepare_staging("public") if args.atomic else "public/"
+        # the staging directory of a failed atomic build is thrown away, so the incremental manifest has to wait for the swap
+        pending_manifest = {} if args.atomic else None
+        # both trees are walked once, every later stage works from these indexes
+        ignore_patterns = default_ignore_patterns + args.ignore
+        static_files = scan_files("static", ignore_patterns)
+        content_files = scan_files("content/", ignore_patterns)
+        if args.merge_shards:
+            print(f"Merged {merge_shards(args.shard_dir, dest_dir)} files from the shards in {args.shard_dir}")
+        else:
+            assets = None
+            if args.fingerprint or args.image_sizes or args.critical_css:
+                image_index = load_image_index(default_image_index_path) if args.image_sizes else None
+                assets = scan_assets("static", args.fingerprint, image_index, static_files, args.critical_css)
+                if image_index is not None:
+                    save_image_index(image_index, default_image_index_path)
+            # of a sharded build only shard 1 carries the static files
+            copy_static = shard_index in (None, 1)
+            if copy_static and (args.incremental or args.sync or args.atomic):
+                print(sync_from_to("static", dest_dir, default_asset_manifest_path, args.checksum, args.hardlink, args.copy_workers, assets, static_files))
+            elif copy_static:
+                copy_from_to("static", dest_dir, assets=assets, files=static_files)
+            if args.fingerprint and copy_static:
+                save_asset_manifest(assets, dest_dir)
+            # a shard renders its part of the pages, every generation path below works from the narrowed index
+            page_files = shard_files(content_files, shard_index, shard_count) if args.shard else content_files
+
+            if args.async_io:
+                import async_build
+                errors = async_build.generate_pages_async_recursive("content/", "template.html", dest_dir, args.io_concurrency, args.workers, values, args.stream_threshold, assets, page_files, args.minify)
+                if errors:
+                    raise BuildError(errors)
+            elif args.incremental:
+                generate_pages_incremental("content/", "template.html", dest_dir, args.manifest, args.workers, values, timings, cache, args.stream_threshold, assets, page_files, args.minify, memory, pending_manifest)
+            else:
+                # with --workers 1 the pages are built one by one in this process, a failing page never stops the others
+                errors = generate_pages_parallel("content/", "template.html", dest_dir, args.workers, values, timings, cache, args.stream_threshold, assets, page_files, args.minify, memory)
+                if errors:
+                    raise BuildError(errors)
+            if args.shard:
+                print(f"Wrote shard {shard_index}/{shard_count} to {dest_dir}, manifest {write_shard_manifest(args.shard_dir, shard_index, shard_count, content_files, copy_static)}")
+                return
+
+        search_files = []
+        if args.search:
+            search_result = build_search_index(find_pages("content/", dest_dir, content_files), dest_dir, default_search_manifest_path)
+            search_files = [pathlib.Path(path).relative_to(dest_dir).as_posix() for path in search_result.files]
+            print(search_result)
+
+        if codec_names:
+            print(compress_tree(dest_dir, codec_names, default_compress_manifest_path, args.compress_min_size))
+
+        if args.atomic:
+            # whatever the live site has that this build did not produce is gone in the new generation
+            expected = {fingerprinted_path(assets, relative_path) for relative_path in static_files}
+            if args.fingerprint:
+                expected.add(default_asset_manifest_name)
+            expected.update(search_files)
+            expected.update(pathlib.Path(dest_path).relative_to(dest_dir).as_posix() for _, dest_path in find_pages("content/", dest_dir, content_files))
+            expected.update([relative_path + suffix for relative_path in expected for suffix in sidecar_suffixes(codec_names)])
+            prune_tree(dest_dir, expected)
+            print(f"Swapped in {swap_in(dest_dir, 'public', default_generations_dir, args.keep_generations)}")
+            if args.incremental:
+                save_manifest(args.manifest, pending_manifest)
+    except (BuildError, MergeError) as error:
+        print(error, file=sys.stderr)
+        if args.atomic:
+            print("public/ was left unchanged", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            save_block_cache(cache, args.block_cache)
+            print(cache.stats())
+        if memory is not None:
+            memory.stop()
+            print(format_memory_report(memory))
+            if args.memory_report:
+                write_memory_report_json(memory, args.memory_report)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if timings:
+            if args.report:
+                print(format_report(timings))
+            if args.report_json:
+                write_report_json(timings, args.report_json)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import hashlib
+import json
+import pathlib
+
+manifest_version = 1
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path, section="pages"):
+    manifest_path = pathlib.Path(manifest_path)
+    if not manifest_path.is_file():
+        return {}
+    try:
+        with open(manifest_path) as manifest_file:
+            data = json.load(manifest_file)
+    except (OSError, ValueError):
+        # a broken manifest only costs a full rebuild
+        return {}
+    if data.get("version") != manifest_version:
+        return {}
+    return data.get(section, {})
+
+def save_manifest(manifest_path, entries, section="pages"):
+    manifest_path = pathlib.Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w") as manifest_file:
+        json.dump({"version": manifest_version, section: entries}, manifest_file, indent=1, sort_keys=True)
+    tmp_path.replace(manifest_path)
+
+def manifest_entry(source_hash, template_hash, dest_path):
+    return {"source_hash": source_hash, "template_hash": template_hash, "dest": str(dest_path)}
+
+def is_up_to_date(entry, source_hash, template_hash, dest_path):
+    if entry is None:
+        return False
+    if entry.get("source_hash") != source_hash or entry.get("template_hash") != template_hash:
+        return False
+    if entry.get("dest") != str(dest_path):
+        return False
+    return pathlib.Path(dest_path).is_file()
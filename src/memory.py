@@ -0,0 +1,86 @@
+import json
+import tracemalloc
+
+over_budget_actions = ("fail", "stream")
+
+class MemoryBudgetExceeded(Exception):
+    def __init__(self, stage, peak, budget) -> None:
+        self.stage = stage
+        self.peak = peak
+        self.budget = budget
+        super().__init__(f"Peak memory {format_bytes(peak)} in {stage} exceeds the budget of {format_bytes(budget)}")
+
+def format_bytes(size):
+    if abs(size) < 1024:
+        return f"{size} B"
+    for unit in ("KiB", "MiB", "GiB"):
+        size /= 1024
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+
+class PageMemory:
+    # Lap style like instrument.StageTimer and passed where a timer goes: every lap books the peak traced memory
+    # since the previous lap on the stage, relative to what was allocated when the page started. Laps go on to
+    # timer as well, so time and memory can be recorded together.
+    __slots__ = ("stages", "base", "budget", "timer")
+
+    def __init__(self, timer, budget=None) -> None:
+        self.stages = {}
+        self.timer = timer
+        self.budget = budget
+        self.base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def lap(self, stage):
+        self.timer.lap(stage)
+        peak = tracemalloc.get_traced_memory()[1] - self.base
+        self.stages[stage] = max(self.stages.get(stage, 0), peak)
+        tracemalloc.reset_peak()
+        if self.budget is not None and peak > self.budget:
+            raise MemoryBudgetExceeded(stage, peak, self.budget)
+
+class MemoryReport:
+    # Peak memory per page and stage, measured with tracemalloc. A page over budget fails, or with over_budget
+    # "stream" is built again on the low memory streaming path. Only meaningful when pages are built one at a time
+    # in this process, allocations of other threads and processes would be mixed in or missed.
+    def __init__(self, budget=None, over_budget="fail") -> None:
+        if over_budget not in over_budget_actions:
+            raise Exception(f"Unknown over budget action {over_budget}, expected one of {', '.join(over_budget_actions)}")
+        self.budget = budget
+        self.over_budget = over_budget
+        self.pages = []
+        self.started = False
+
+    def track(self, timer):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        return PageMemory(timer, self.budget)
+
+    def add(self, source, page_memory, streamed=False):
+        self.pages.append((source, page_memory.stages, streamed))
+
+    def stop(self):
+        # ends tracing if track() started it
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+    def summarize(self):
+        # pages sorted by their highest stage peak, worst first
+        pages = [{"source": str(source), "peak": max(stages.values(), default=0), "stages": stages, "streamed": streamed} for source, stages, streamed in self.pages]
+        return sorted(pages, key=lambda page: page["peak"], reverse=True)
+
+def format_memory_report(report, top=10):
+    pages = report.summarize()
+    budget = f", budget {format_bytes(report.budget)}" if report.budget is not None else ""
+    lines = [f"Memory report: {len(pages)} pages{budget}", "", f"Worst pages (top {min(top, len(pages))}):"]
+    for page in pages[:top]:
+        worst = max(page["stages"], key=page["stages"].get) if page["stages"] else "-"
+        streamed = ", streamed" if page["streamed"] else ""
+        lines.append(f"  {format_bytes(page['peak']):>12}  {page['source']}  (mostly {worst}{streamed})")
+    return "\n".join(lines)
+
+def write_memory_report_json(report, report_path):
+    with open(report_path, "w") as report_file:
+        json.dump({"budget": report.budget, "pages": report.summarize()}, report_file, indent=1)
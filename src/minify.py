@@ -0,0 +1,126 @@
+import re
+
+# html whitespace, a no-break space is content and stays
+whitespace = " \t\n\r\f"
+# a run with a line break keeps one, so the output still has lines, any other run becomes a single space
+line_break_run_pattern = re.compile(r"[ \t\r\f]*\n[ \t\n\r\f]*")
+space_run_pattern = re.compile(r"[ \t\r\f]{2,}|[\t\r\f]")
+# a tag up to its closing ">", quoted attribute values may contain anything but their own quote
+tag_pattern = re.compile(r"""<[^<>"']*(?:(?:"[^"]*"|'[^']*')[^<>"']*)*>""")
+# where the plain run ends: a comment, a raw element or a tag with quoted attribute values
+markup_pattern = re.compile(r"""<!--|<(?:pre|textarea|script|style)[\s/>]|<[^<>"']*["']""", re.IGNORECASE)
+# the start of a tag running to the end of the buffer, its rest is still to come
+partial_tag_pattern = re.compile(r"""<[^<>"']*(?:(?:"[^"]*"|'[^']*')[^<>"']*)*(?:"[^"]*|'[^']*)?""")
+# elements whose content is passed through untouched
+raw_tag_pattern = re.compile(r"<(pre|textarea|script|style)[\s/>]", re.IGNORECASE)
+raw_end_patterns = {name: re.compile(r"</%s[ \t\n\r\f]*>" % name, re.IGNORECASE) for name in ("pre", "textarea", "script", "style")}
+# characters of a raw element held back when its closing tag is not in sight yet, so a tag cut in two is found
+raw_tail_length = 64
+default_buffer_size = 16 * 1024
+
+def collapse(text):
+    return space_run_pattern.sub(" ", line_break_run_pattern.sub("\n", text))
+
+class HtmlMinifier:
+    # Write-only stream in front of another one that collapses the whitespace runs of the text between tags.
+    # Tags, attribute values, comments and the content of pre, textarea, script and style are written as they
+    # are. Chunks can be cut anywhere, whatever is incomplete waits for the next write, so the page never has
+    # to be held as a whole. finish() writes the rest.
+    def __init__(self, stream, buffer_size=default_buffer_size) -> None:
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.buffered = 0
+        self.pending = ""
+        self.raw_end = None
+        self.size_in = 0
+        self.size_out = 0
+
+    @property
+    def saved(self):
+        # only ascii whitespace is removed, so characters and utf-8 bytes saved are the same
+        return self.size_in - self.size_out
+
+    def write(self, chunk):
+        self.size_in += len(chunk)
+        self.parts.append(chunk)
+        self.buffered += len(chunk)
+        if self.buffered >= self.buffer_size:
+            self.process(False)
+        return len(chunk)
+
+    def finish(self):
+        self.process(True)
+        return self.saved
+
+    def process(self, final):
+        text = self.pending + "".join(self.parts)
+        self.parts = []
+        self.buffered = 0
+        out = []
+        pos = 0
+        end = len(text)
+        while pos < end:
+            if self.raw_end is not None:
+                match = self.raw_end.search(text, pos)
+                if match is None:
+                    keep = end if final else max(pos, end - raw_tail_length)
+                    out.append(text[pos:keep])
+                    pos = keep
+                    break
+                out.append(text[pos:match.end()])
+                pos = match.end()
+                self.raw_end = None
+                continue
+
+            # text and plain tags up to the next comment, raw element or tag with quoted values are collapsed in one go,
+            # whitespace inside a tag without quotes is as insignificant as between tags
+            match = markup_pattern.search(text, pos)
+            if match is None:
+                stop = end
+                if not final:
+                    # a whitespace run or a tag at the end may go on in the next chunk
+                    stop = len(text.rstrip(whitespace))
+                    lt = text.rfind("<", pos, stop)
+                    if lt != -1 and text.find(">", lt, stop) == -1:
+                        stop = lt
+                out.append(collapse(text[pos:stop]))
+                pos = max(pos, stop)
+                break
+            if match.start() > pos:
+                out.append(collapse(text[pos:match.start()]))
+                pos = match.start()
+
+            if text.startswith("<!--", pos):
+                close = text.find("-->", pos + 4)
+                if close == -1:
+                    if final:
+                        out.append(text[pos:])
+                        pos = end
+                    break
+                out.append(text[pos:close + 3])
+                pos = close + 3
+                continue
+            match = tag_pattern.match(text, pos)
+            if match is None:
+                if not final and partial_tag_pattern.fullmatch(text, pos):
+                    break
+                # a lone "<" in the text
+                out.append("<")
+                pos += 1
+                continue
+            tag = match.group()
+            out.append(tag)
+            pos = match.end()
+            raw = raw_tag_pattern.match(tag)
+            if raw is not None and not tag.endswith("/>"):
+                self.raw_end = raw_end_patterns[raw.group(1).lower()]
+
+        self.pending = text[pos:]
+        if final and self.pending:
+            out.append(self.pending)
+            self.pending = ""
+        output = "".join(out)
+        self.size_out += len(output)
+        if output:
+            self.stream.write(output)
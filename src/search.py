@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pathlib
+import re
+from manifest import hash_file, load_manifest, save_manifest
+from text_parser import scan_markdown, text_to_textnodes
+
+default_search_manifest_path = ".search_manifest.json"
+search_dir_name = "search"
+default_prefix_length = 2
+title_weight = 5
+token_pattern = re.compile(r"\w+")
+min_token_length = 2
+
+# The index is written to <output>/search/: meta.json holds the prefix length and the pages as [url, title] by
+# document id, every terms/<prefix>.json the terms starting with that prefix as {term: [[document id, score], ...]},
+# best match first. A client only fetches meta.json and the shard of the term typed.
+
+class SearchResult:
+    def __init__(self) -> None:
+        self.indexed = []
+        self.reused = []
+        self.written = []
+        self.unchanged = []
+        self.removed = []
+        self.files = []
+
+    def __repr__(self) -> str:
+        return f"SearchResult({len(self.indexed)} pages indexed, {len(self.reused)} reused, {len(self.written)} files written, {len(self.unchanged)} unchanged, {len(self.removed)} removed)"
+
+def add_tokens(terms, text, weight):
+    for token in token_pattern.findall(text.lower()):
+        if len(token) >= min_token_length:
+            terms[token] = terms.get(token, 0) + weight
+
+def page_terms(markdown):
+    # term -> score from the text of the inline nodes, the title words count title_weight times more
+    scanned_blocks, title = scan_markdown(markdown)
+    terms = {}
+    for scanned_block in scanned_blocks:
+        for text in scanned_block.inline_texts:
+            for text_node in text_to_textnodes(text):
+                add_tokens(terms, text_node.text, 1)
+    if title is not None:
+        add_tokens(terms, title, title_weight)
+    return title, terms
+
+def shard_name(term, prefix_length=default_prefix_length):
+    prefix = term[:prefix_length]
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    # anything that is not a plain file name is hex encoded
+    return "_" + prefix.encode("utf-8").hex()
+
+def page_url(dest_path, dest_dir_path):
+    url = "/" + pathlib.Path(dest_path).relative_to(dest_dir_path).as_posix()
+    if url.endswith("/index.html"):
+        return url[:-len("index.html")]
+    return url
+
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, sort_keys=True)
+
+def write_if_changed(path, text, old_hash, result):
+    # returns the hash of text, the file is only written when it differs from the last build or is missing
+    text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    if text_hash == old_hash and path.is_file():
+        result.unchanged.append(path)
+    else:
+        # replaced rather than overwritten, an atomic build may hold the old file as a hardlink of the live site
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+        result.written.append(path)
+    result.files.append(path)
+    return text_hash
+
+def build_search_index(pages, dest_dir_path, manifest_path=default_search_manifest_path, prefix_length=default_prefix_length):
+    # pages are (source, destination) pairs like find_pages yields. Only pages whose source changed are
+    # tokenized again and only shards whose content changed are written.
+    dest_dir_path = pathlib.Path(dest_dir_path)
+    search_dir_path = dest_dir_path / search_dir_name
+    terms_dir_path = search_dir_path / "terms"
+    terms_dir_path.mkdir(parents=True, exist_ok=True)
+    old = load_manifest(manifest_path, "search")
+    old_pages = old.get("pages", {})
+    ids = old.get("ids", {})
+    old_shards = old.get("shards", {})
+    # shard hashes of another prefix length say nothing about the new shards
+    reusable_shards = old_shards if old.get("prefix_length") == prefix_length else {}
+    result = SearchResult()
+
+    new_pages = {}
+    for from_path, dest_path in pages:
+        source_hash = hash_file(from_path)
+        entry = old_pages.get(str(from_path))
+        url = page_url(dest_path, dest_dir_path)
+        if entry is not None and entry["hash"] == source_hash and entry["url"] == url:
+            new_pages[str(from_path)] = entry
+            result.reused.append(from_path)
+            continue
+        try:
+            with open(from_path) as src_file:
+                title, terms = page_terms(src_file.read())
+        except Exception as error:
+            print(f"Not indexing {from_path}: {error}")
+            continue
+        new_pages[str(from_path)] = {"hash": source_hash, "url": url, "title": title or url, "terms": terms}
+        result.indexed.append(from_path)
+
+    # document ids stay with their url, so a changed page only touches the shards of its own terms
+    urls = {entry["url"] for entry in new_pages.values()}
+    ids = {url: doc_id for url, doc_id in ids.items() if url in urls}
+    next_id = max(ids.values(), default=-1) + 1
+    for entry in sorted(new_pages.values(), key=lambda entry: entry["url"]):
+        if entry["url"] not in ids:
+            ids[entry["url"]] = next_id
+            next_id += 1
+    docs = [None] * next_id
+    shards = {}
+    for entry in new_pages.values():
+        doc_id = ids[entry["url"]]
+        docs[doc_id] = [entry["url"], entry["title"]]
+        for term, score in entry["terms"].items():
+            shards.setdefault(shard_name(term, prefix_length), {}).setdefault(term, []).append([doc_id, score])
+
+    new_shards = {}
+    for name, terms in shards.items():
+        for postings in terms.values():
+            postings.sort(key=lambda posting: (-posting[1], posting[0]))
+        new_shards[name] = write_if_changed(terms_dir_path / f"{name}.json", compact_json(terms), reusable_shards.get(name), result)
+    for name in old_shards:
+        if name not in new_shards:
+            (terms_dir_path / f"{name}.json").unlink(missing_ok=True)
+            result.removed.append(terms_dir_path / f"{name}.json")
+
+    meta_hash = write_if_changed(search_dir_path / "meta.json", compact_json({"prefix_length": prefix_length, "docs": docs}), old.get("meta"), result)
+    save_manifest(manifest_path, {"pages": new_pages, "ids": ids, "shards": new_shards, "meta": meta_hash, "prefix_length": prefix_length}, "search")
+    return result
@@ -0,0 +1,203 @@
+import argparse
+import collections
+import email.utils
+import http.server
+import mimetypes
+import os
+import posixpath
+import threading
+import urllib.parse
+from assets import fingerprint_pattern
+from compress import codecs
+
+default_cache_bytes = 32 * 1024 * 1024
+default_cache_file_size = 64 * 1024
+# fingerprinted assets never change under their name
+immutable_cache_control = "public, max-age=31536000, immutable"
+
+class FileCache:
+    # contents of small files by path, checked against the file's stat on every hit, least recently used evicted first
+    def __init__(self, budget=default_cache_bytes, max_file_size=default_cache_file_size) -> None:
+        self.budget = budget
+        self.max_file_size = max_file_size
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, file_path, stat):
+        if stat.st_size > self.max_file_size:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is not None and entry[0] == key:
+                self.entries.move_to_end(file_path)
+                return entry[1]
+        with open(file_path, "rb") as file:
+            data = file.read()
+        if len(data) != stat.st_size:
+            # changed while reading, serve it but do not keep it
+            return data
+        with self.lock:
+            old_entry = self.entries.pop(file_path, None)
+            if old_entry is not None:
+                self.size -= len(old_entry[1])
+            self.entries[file_path] = (key, data)
+            self.size += len(data)
+            while self.size > self.budget and self.entries:
+                _, (_, old_data) = self.entries.popitem(last=False)
+                self.size -= len(old_data)
+        return data
+
+def resolve_path(directory, url_path):
+    # file system path for an url path, None if it would leave directory or is no valid file name
+    url_path = urllib.parse.unquote(url_path.split("?", 1)[0].split("#", 1)[0])
+    parts = [part for part in posixpath.normpath(url_path).split("/") if part and part != "."]
+    if any(part == ".." or os.sep in part or "\0" in part for part in parts):
+        return None
+    return os.path.join(directory, *parts)
+
+def accepted_encodings(accept_encoding):
+    # content codings of an Accept-Encoding header the client takes, best first
+    encodings = []
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            encodings.append((quality, name.strip().lower()))
+    return [name for _, name in sorted(encodings, key=lambda encoding: encoding[0], reverse=True)]
+
+def choose_variant(file_path, accept_encoding, stat):
+    # (content coding or None, path, stat) of the precompressed sidecar the client prefers, the file itself if there
+    # is none. compress gives a sidecar the mtime of its original, one with another mtime is left from an older version.
+    for encoding in accepted_encodings(accept_encoding):
+        if encoding in codecs:
+            variant_path = file_path + codecs[encoding][0]
+            try:
+                variant_stat = os.stat(variant_path)
+            except OSError:
+                continue
+            if os.path.isfile(variant_path) and variant_stat.st_mtime_ns == stat.st_mtime_ns:
+                return encoding, variant_path, variant_stat
+    return None, file_path, stat
+
+def make_etag(stat, encoding):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+def is_not_modified(headers, etag, mtime):
+    # If-None-Match wins over If-Modified-Since, like RFC 9110 asks
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+def handler_for(directory, cache, cache_control="no-cache"):
+    class StaticRequestHandler(http.server.BaseHTTPRequestHandler):
+        # HTTP/1.1 with a Content-Length on every response keeps connections alive
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_file(True)
+
+        def do_HEAD(self):
+            self.send_file(False)
+
+        def send_file(self, with_body):
+            # the directory path is joined on every request, so a public/ symlink swapped by an atomic build is followed
+            file_path = resolve_path(directory, self.path)
+            if file_path is not None and os.path.isdir(file_path):
+                if not self.path.split("?", 1)[0].endswith("/"):
+                    return self.send_redirect(self.path.split("?", 1)[0] + "/")
+                file_path = os.path.join(file_path, "index.html")
+            try:
+                stat = os.stat(file_path) if file_path is not None else None
+            except OSError:
+                stat = None
+            if stat is None or not os.path.isfile(file_path):
+                return self.send_body(404, b"Not found", "text/plain; charset=utf-8", with_body)
+
+            encoding, variant_path, variant_stat = choose_variant(file_path, self.headers.get("Accept-Encoding"), stat)
+            etag = make_etag(stat, encoding)
+            not_modified = is_not_modified(self.headers, etag, stat.st_mtime)
+            self.send_response(304 if not_modified else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+            self.send_header("Cache-Control", immutable_cache_control if fingerprint_pattern.search(file_path) else cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            if not_modified:
+                self.end_headers()
+                return
+
+            body = cache.get(variant_path, variant_stat) if with_body else None
+            self.send_header("Content-Type", mimetypes.guess_type(file_path)[0] or "application/octet-stream")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(len(body) if body is not None else variant_stat.st_size))
+            self.end_headers()
+            if not with_body:
+                return
+            if body is not None:
+                self.wfile.write(body)
+                return
+            # larger files go from the page cache to the socket with sendfile, without passing through Python
+            with open(variant_path, "rb") as file:
+                self.connection.sendfile(file, 0, variant_stat.st_size)
+
+        def send_redirect(self, location):
+            self.send_response(301)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def send_body(self, status, body, content_type, with_body=True):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if with_body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StaticRequestHandler
+
+def make_server(directory, port=8888, cache=None, cache_control="no-cache", bind=""):
+    server = http.server.ThreadingHTTPServer((bind, port), handler_for(directory, cache or FileCache(), cache_control))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the generated site")
+    parser.add_argument("--directory", default="public", help="directory to serve")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--bind", default="", help="address to listen on, every interface by default")
+    parser.add_argument("--cache-bytes", type=int, default=default_cache_bytes, help="memory kept for small files")
+    parser.add_argument("--cache-control", default="no-cache", help="Cache-Control header of every file")
+    args = parser.parse_args()
+
+    server = make_server(args.directory, args.port, FileCache(args.cache_bytes), args.cache_control, args.bind)
+    print(f"Serving {args.directory} on http://localhost:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import pathlib
+import shutil
+from sync import copy_file, scan_files
+from template import layout_file_name
+
+default_shard_dir = "shards"
+
+# A sharded build splits the pages over count machines. Shard i writes its pages to <shard dir>/<i>/ and lists
+# them in <shard dir>/<i>.json, shard 1 also copies the static files. The merge step checks that the shards belong
+# to the same content tree, that every page was built exactly once and that no file is missing before it combines
+# them into one output directory.
+
+class MergeError(Exception):
+    def __init__(self, problems) -> None:
+        self.problems = problems
+        details = "\n".join(f"  {problem}" for problem in problems)
+        super().__init__(f"Cannot merge the shards, {len(problems)} problem(s):\n{details}")
+
+def parse_shard(shard):
+    # "2/4" -> (2, 4), shards are numbered from 1
+    index, separator, count = shard.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit() or not 1 <= int(index) <= int(count):
+        raise Exception(f"Invalid shard {shard}, expected i/N with 1 <= i <= N")
+    return int(index), int(count)
+
+def page_sources(content_files):
+    return sorted(relative_path for relative_path in content_files if pathlib.PurePosixPath(relative_path).name != layout_file_name)
+
+def partition(content_files, count):
+    # Deterministic split of the pages into count shards of about the same total source size: biggest page first
+    # onto the shard with the least bytes so far. Every machine computes the same split from the same tree.
+    loads = [0] * count
+    shards = [[] for _ in range(count)]
+    for relative_path in sorted(page_sources(content_files), key=lambda relative_path: (-content_files[relative_path].st_size, relative_path)):
+        lightest = min(range(count), key=lambda shard: (loads[shard], shard))
+        loads[lightest] += content_files[relative_path].st_size
+        shards[lightest].append(relative_path)
+    return [sorted(shard) for shard in shards]
+
+def shard_files(content_files, index, count):
+    # the part of the content index shard index builds, the layouts stay so every page finds its template
+    pages = set(partition(content_files, count)[index - 1])
+    return {relative_path: stat for relative_path, stat in content_files.items() if relative_path in pages or pathlib.PurePosixPath(relative_path).name == layout_file_name}
+
+def tree_digest(content_files):
+    return hashlib.sha256("\n".join(page_sources(content_files)).encode("utf-8")).hexdigest()
+
+def shard_manifest_path(shard_dir_path, index):
+    return pathlib.Path(shard_dir_path) / f"{index}.json"
+
+def prepare_shard(shard_dir_path, index):
+    # every shard starts from an empty output directory, leftovers would end up in the merge
+    output_path = pathlib.Path(shard_dir_path) / str(index)
+    if output_path.exists():
+        shutil.rmtree(output_path)
+    output_path.mkdir(parents=True)
+    shard_manifest_path(shard_dir_path, index).unlink(missing_ok=True)
+    return output_path
+
+def write_shard_manifest(shard_dir_path, index, count, content_files, with_static):
+    output_path = pathlib.Path(shard_dir_path) / str(index)
+    manifest = {
+        "shard": index,
+        "count": count,
+        "tree": tree_digest(content_files),
+        "pages": partition(content_files, count)[index - 1],
+        "static": with_static,
+        "files": {relative_path: stat.st_size for relative_path, stat in sorted(scan_files(output_path).items())},
+    }
+    manifest_path = shard_manifest_path(shard_dir_path, index)
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    return manifest_path
+
+def check_shards(shard_dir_path):
+    # returns the manifests of all shards, raises MergeError listing everything that does not add up
+    shard_dir_path = pathlib.Path(shard_dir_path)
+    problems = []
+    first_path = shard_manifest_path(shard_dir_path, 1)
+    if not first_path.is_file():
+        raise MergeError([f"{first_path} is missing"])
+    with open(first_path) as manifest_file:
+        count = json.load(manifest_file)["count"]
+    manifests = []
+    for index in range(1, count + 1):
+        manifest_path = shard_manifest_path(shard_dir_path, index)
+        if not manifest_path.is_file():
+            problems.append(f"shard {index}/{count} is missing, no {manifest_path}")
+            continue
+        with open(manifest_path) as manifest_file:
+            manifests.append(json.load(manifest_file))
+
+    if manifests and any((manifest["count"], manifest["tree"]) != (count, manifests[0]["tree"]) for manifest in manifests):
+        problems.append("the shards were built from different content trees or shard counts")
+    pages = {}
+    for manifest in manifests:
+        for page in manifest["pages"]:
+            if page in pages:
+                problems.append(f"page {page} was built by shards {pages[page]} and {manifest['shard']}")
+            pages[page] = manifest["shard"]
+    if manifests and hashlib.sha256("\n".join(sorted(pages)).encode("utf-8")).hexdigest() != manifests[0]["tree"]:
+        problems.append("the shards together do not cover the content tree")
+    static_shards = [manifest["shard"] for manifest in manifests if manifest["static"]]
+    if manifests and len(static_shards) != 1:
+        problems.append(f"static files should come from exactly one shard, got {static_shards}")
+
+    owners = {}
+    for manifest in manifests:
+        output_path = shard_dir_path / str(manifest["shard"])
+        for relative_path, size in manifest["files"].items():
+            if relative_path in owners:
+                problems.append(f"{relative_path} is in shards {owners[relative_path]} and {manifest['shard']}")
+            owners[relative_path] = manifest["shard"]
+            file_path = output_path / relative_path
+            if not file_path.is_file() or file_path.stat().st_size != size:
+                problems.append(f"{file_path} is missing or incomplete")
+    if problems:
+        raise MergeError(problems)
+    return manifests
+
+def merge_shards(shard_dir_path, dest):
+    # replaces dest with the combined output of all shards, hardlinked where the file system allows
+    manifests = check_shards(shard_dir_path)
+    dest_path = pathlib.Path(dest)
+    if dest_path.is_symlink():
+        dest_path.unlink()
+    elif dest_path.exists():
+        shutil.rmtree(dest_path)
+    dest_path.mkdir(parents=True)
+    merged = 0
+    for manifest in manifests:
+        output_path = pathlib.Path(shard_dir_path) / str(manifest["shard"])
+        for relative_path in manifest["files"]:
+            copy_file(output_path / relative_path, dest_path / relative_path, link=True)
+            merged += 1
+    return merged
@@ -0,0 +1,75 @@
+import os
+import pathlib
+import shutil
+from sync import scan_files
+
+default_generations_dir = ".public-generations"
+staging_dir_name = "staging"
+
+# Atomic builds: the site is built in <generations>/staging, which starts out as hardlinks of the live generation,
+# so unchanged files cost neither copies nor disk. Only a successful build is renamed to <generations>/<number>
+# and swapped in by replacing the public symlink, a failed one leaves the live site untouched.
+
+def generation_numbers(generations_path):
+    generations_path = pathlib.Path(generations_path)
+    if not generations_path.is_dir():
+        return []
+    return sorted(int(entry.name) for entry in generations_path.iterdir() if entry.name.isdigit())
+
+def link_tree(src, dest):
+    # hardlinks every file below src into dest, copying where the file system cannot link
+    for relative_path in scan_files(src):
+        dest_file = pathlib.Path(dest) / relative_path
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(pathlib.Path(src) / relative_path, dest_file)
+        except OSError:
+            shutil.copy2(pathlib.Path(src) / relative_path, dest_file)
+
+def prepare_staging(dest, generations_path=default_generations_dir):
+    # returns a fresh staging directory holding the live site as hardlinks
+    dest_path = pathlib.Path(dest)
+    staging_path = pathlib.Path(generations_path) / staging_dir_name
+    if staging_path.exists():
+        # left over from a failed build
+        shutil.rmtree(staging_path)
+    staging_path.mkdir(parents=True)
+    if dest_path.is_dir():
+        link_tree(dest_path.resolve(), staging_path)
+    return staging_path
+
+def prune_tree(root, keep):
+    # removes every file below root whose relative posix path is not in keep, and the directories left empty
+    root = pathlib.Path(root)
+    removed = []
+    for relative_path in scan_files(root):
+        if relative_path not in keep:
+            (root / relative_path).unlink()
+            removed.append(root / relative_path)
+    for dir_path, _, _ in sorted(os.walk(root), key=lambda walked: len(walked[0]), reverse=True):
+        if dir_path != str(root) and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    return removed
+
+def swap_in(staging_path, dest, generations_path=default_generations_dir, keep=1):
+    # Turns the staging directory into the next generation and points dest at it with one rename.
+    # keep older generations stay on disk, so requests still reading the previous one can finish.
+    dest_path = pathlib.Path(dest)
+    generations_path = pathlib.Path(generations_path)
+    numbers = generation_numbers(generations_path)
+    number = numbers[-1] + 1 if numbers else 1
+    if dest_path.is_dir() and not dest_path.is_symlink():
+        # the first atomic build moves the existing plain directory aside, the only moment dest is briefly missing
+        dest_path.rename(generations_path / str(number))
+        number += 1
+    generation_path = generations_path / str(number)
+    pathlib.Path(staging_path).rename(generation_path)
+
+    link_path = dest_path.with_name(f".{dest_path.name}.link-tmp")
+    link_path.unlink(missing_ok=True)
+    link_path.symlink_to(os.path.relpath(generation_path, dest_path.parent))
+    os.replace(link_path, dest_path)
+
+    for old_number in generation_numbers(generations_path)[:-(keep + 1)]:
+        shutil.rmtree(generations_path / str(old_number))
+    return generation_path
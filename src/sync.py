@@ -0,0 +1,142 @@
+import concurrent.futures
+import fnmatch
+import os
+import pathlib
+import shutil
+import sys
+from manifest import hash_file, load_manifest, save_manifest
+
+default_asset_manifest_path = ".asset_manifest.json"
+# editor backups, swap and lock files and OS litter, never part of the site
+default_ignore_patterns = ["*~", ".*.swp", ".*.swo", ".*.swx", ".#*", "#*#", "4913", "*.tmp", ".DS_Store", "Thumbs.db"]
+
+class SyncResult:
+    def __init__(self) -> None:
+        self.copied = []
+        self.unchanged = []
+        self.removed = []
+
+    def __repr__(self) -> str:
+        return f"SyncResult({len(self.copied)} copied, {len(self.unchanged)} unchanged, {len(self.removed)} removed)"
+
+def is_ignored(name, ignore_patterns):
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in ignore_patterns)
+
+def scan_files(root, ignore_patterns=()):
+    # Relative posix path -> os.stat_result for every file below root, walked iteratively. One scan serves as the
+    # file index of a whole build, files and directories whose name matches one of ignore_patterns are left out.
+    # Symlinked directories are followed, one that links back to a directory it is in is skipped with a warning.
+    files = {}
+    root = pathlib.Path(root)
+    root_stat = os.stat(root)
+    # every directory goes with the (st_dev, st_ino) of itself and the directories it is in
+    stack = [(root, frozenset([(root_stat.st_dev, root_stat.st_ino)]))]
+    while stack:
+        directory, ancestors = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if ignore_patterns and is_ignored(entry.name, ignore_patterns):
+                    continue
+                if entry.is_dir():
+                    directory_stat = entry.stat()
+                    directory_id = (directory_stat.st_dev, directory_stat.st_ino)
+                    if directory_id in ancestors:
+                        print(f"Warning: skipping {entry.path}, a symlink loop", file=sys.stderr)
+                        continue
+                    stack.append((entry.path, ancestors | {directory_id}))
+                elif entry.is_file():
+                    files[pathlib.Path(entry.path).relative_to(root).as_posix()] = entry.stat()
+    return files
+
+def is_same_file(src_file, src_stat, dest_file, checksum=False):
+    try:
+        dest_stat = os.stat(dest_file)
+    except FileNotFoundError:
+        return False
+    if (src_stat.st_ino, src_stat.st_dev) == (dest_stat.st_ino, dest_stat.st_dev):
+        return True
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    if checksum and hash_file(src_file) == hash_file(dest_file):
+        # same content, only the timestamp moved, so the next comparison can stay cheap
+        os.utime(dest_file, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        return True
+    return False
+
+def copy_file(src_file, dest_file, link=False):
+    # writes next to the destination first, so a half copied file is never visible under its real name
+    dest_file = pathlib.Path(dest_file)
+    if dest_file.is_dir() and not dest_file.is_symlink():
+        shutil.rmtree(dest_file)
+    dest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = dest_file.with_name(f".{dest_file.name}.sync-tmp")
+    tmp_file.unlink(missing_ok=True)
+    if link:
+        try:
+            os.link(src_file, tmp_file)
+            os.replace(tmp_file, dest_file)
+            return
+        except OSError:
+            # different file systems or no hardlink support, fall back to copying
+            tmp_file.unlink(missing_ok=True)
+    # shutil.copyfile uses the kernel's fast copy paths (sendfile, fcopyfile) where they exist
+    shutil.copy2(src_file, tmp_file)
+    os.replace(tmp_file, dest_file)
+
+def remove_output(dest_path, dest_dir_path):
+    # delete a generated file and every directory it leaves empty, up to dest_dir_path
+    dest_path = pathlib.Path(dest_path)
+    dest_dir_path = pathlib.Path(dest_dir_path).resolve()
+    dest_path.unlink(missing_ok=True)
+    parent = dest_path.parent.resolve()
+    while parent != dest_dir_path and dest_dir_path in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+def sync_from_to(src, dest, manifest_path=default_asset_manifest_path, checksum=False, link=False, workers=8, assets=None, src_files=None):
+    # Copies only new or changed files from src to dest and removes files a previous sync copied that are not part
+    # of src any more. Everything else in dest, like generated pages, is left alone. With assets every file is
+    # copied under its fingerprinted name. src_files is a scan_files result of src to reuse.
+    src_path = pathlib.Path(src)
+    if not src_path.exists() or not src_path.is_dir():
+        raise Exception("Invalid source directory for copy operations")
+    dest_path = pathlib.Path(dest)
+    dest_path.mkdir(parents=True, exist_ok=True)
+
+    result = SyncResult()
+    if src_files is None:
+        src_files = scan_files(src_path)
+    to_copy = []
+    dest_files = {}
+    for relative_path, src_stat in sorted(src_files.items()):
+        src_file = src_path / relative_path
+        dest_relative_path = relative_path if assets is None else assets.url("/" + relative_path)[1:]
+        dest_files[dest_relative_path] = src_stat
+        dest_file = dest_path / dest_relative_path
+        if is_same_file(src_file, src_stat, dest_file, checksum):
+            result.unchanged.append(dest_file)
+        else:
+            to_copy.append((src_file, dest_file))
+
+    if workers and workers > 1 and len(to_copy) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(lambda job: copy_file(job[0], job[1], link), to_copy):
+                pass
+    else:
+        for src_file, dest_file in to_copy:
+            copy_file(src_file, dest_file, link)
+    result.copied = [dest_file for _, dest_file in to_copy]
+
+    # the manifest holds the copied files by their path in dest
+    for relative_path in load_manifest(manifest_path, "assets"):
+        if relative_path not in dest_files:
+            remove_output(dest_path / relative_path, dest_path)
+            result.removed.append(dest_path / relative_path)
+
+    save_manifest(manifest_path, {relative_path: src_stat.st_size for relative_path, src_stat in dest_files.items()}, "assets")
+    return result
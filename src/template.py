@@ -0,0 +1,90 @@
+import io
+import os
+import pathlib
+import re
+
+layout_file_name = "layout.html"
+placeholder_pattern = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# compiled templates by path, invalidated when the file's mtime or size changes
+template_cache = {}
+
+class Placeholder:
+    __slots__ = ("name", "text")
+
+    def __init__(self, name, text) -> None:
+        self.name = name
+        self.text = text
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Placeholder) and self.name == other.name and self.text == other.text
+
+    def __repr__(self) -> str:
+        return f"Placeholder({self.name}, {self.text})"
+
+def compile_template(template):
+    # splits the template once into literal strings and Placeholder segments
+    segments = []
+    pos = 0
+    for match in placeholder_pattern.finditer(template):
+        if match.start() > pos:
+            segments.append(template[pos:match.start()])
+        segments.append(Placeholder(match.group(1), match.group(0)))
+        pos = match.end()
+    if pos < len(template):
+        segments.append(template[pos:])
+    return segments
+
+def load_template(template_path, stat=None):
+    # stat is the template's os.stat_result if the caller already has it
+    template_path = pathlib.Path(template_path)
+    if stat is None:
+        stat = os.stat(template_path)
+    key = str(template_path)
+    cached = template_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    with open(template_path) as template_file:
+        segments = compile_template(template_file.read())
+    template_cache[key] = ((stat.st_mtime_ns, stat.st_size), segments)
+    return segments
+
+def render_template(segments, values, stream):
+    # values are either strings or callables that write their content into the stream themselves,
+    # placeholders without a value are kept as they are
+    for segment in segments:
+        if isinstance(segment, str):
+            stream.write(segment)
+            continue
+        value = values.get(segment.name)
+        if value is None:
+            stream.write(segment.text)
+        elif callable(value):
+            value(stream)
+        else:
+            stream.write(value)
+
+def render_template_to_string(segments, values):
+    stream = io.StringIO()
+    render_template(segments, values, stream)
+    return stream.getvalue()
+
+def resolve_layout(from_path, content_dir_path, template_path, files=None):
+    # The closest layout.html between the page's directory and the content root overrides the default template.
+    # With files, a scan_files result of the content root, the layouts are looked up without touching the disk.
+    if files is not None:
+        relative_dir = pathlib.PurePosixPath(pathlib.Path(from_path).relative_to(content_dir_path).as_posix()).parent
+        for directory in [relative_dir, *relative_dir.parents]:
+            layout_path = (directory / layout_file_name).as_posix()
+            if layout_path in files:
+                return pathlib.Path(content_dir_path) / layout_path
+        return pathlib.Path(template_path)
+    content_dir_path = pathlib.Path(content_dir_path).resolve()
+    directory = pathlib.Path(from_path).resolve().parent
+    while True:
+        layout_path = directory / layout_file_name
+        if layout_path.is_file():
+            return layout_path
+        if directory == content_dir_path or content_dir_path not in directory.parents:
+            return pathlib.Path(template_path)
+        directory = directory.parent
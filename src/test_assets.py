@@ -0,0 +1,110 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from assets import Assets, fingerprinted_name, fingerprinted_path, save_asset_manifest, scan_assets
+from block_cache import BlockCache
+from main import copy_from_to, generate_page, generate_pages_incremental, render_markdown_page
+from sync import sync_from_to
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.assets = Assets({"/index.css": "/index.0123456789.css", "/images/a.png": "/images/a.abcdefabcd.png"})
+
+    def test_fingerprinted_name(self):
+        self.assertEqual("images/a.0123456789.png", fingerprinted_name("images/a.png", "0123456789abcdef"))
+        self.assertEqual("LICENSE.0123456789", fingerprinted_name("LICENSE", "0123456789abcdef"))
+
+    def test_url(self):
+        self.assertEqual("/index.0123456789.css?v=1#top", self.assets.url("/index.css?v=1#top"))
+        self.assertEqual("/other.css", self.assets.url("/other.css"))
+        self.assertEqual("images/a.abcdefabcd.png", fingerprinted_path(self.assets, "images/a.png"))
+        self.assertEqual("images/a.png", fingerprinted_path(None, "images/a.png"))
+
+    def test_rewrite_html(self):
+        html = """<link href="/index.css" rel="stylesheet"><img src='/images/a.png'><a href="/index.css.map">"""
+        self.assertEqual("""<link href="/index.0123456789.css" rel="stylesheet"><img src='/images/a.abcdefabcd.png'><a href="/index.css.map">""", self.assets.rewrite_html(html))
+
+    def test_cache_key(self):
+        self.assertEqual("plain text", self.assets.cache_key("plain text"))
+        self.assertNotEqual("![a](/images/a.png)", self.assets.cache_key("![a](/images/a.png)"))
+
+
+class TestFingerprintBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.static = self.root / "static"
+        self.public = self.root / "public"
+        self.content = self.root / "content"
+        self.template = self.root / "template.html"
+        (self.static / "images").mkdir(parents=True)
+        self.content.mkdir()
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "a.png").write_bytes(b"png")
+        (self.content / "index.md").write_text("# Home\n\n![a](/images/a.png) and [style](/index.css)")
+        self.template.write_text('<link href="/index.css">{{ Content }}')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def files(self):
+        return sorted(path.relative_to(self.public).as_posix() for path in self.public.rglob("*") if path.is_file())
+
+    def test_copy_and_render(self):
+        assets = scan_assets(self.static)
+        copy_from_to(self.static, self.public, assets=assets)
+        css = assets.url("/index.css")
+        image = assets.url("/images/a.png")
+        self.assertEqual(sorted([css[1:], image[1:]]), self.files())
+        html = render_markdown_page((self.content / "index.md").read_text(), self.template, assets=assets)
+        self.assertEqual(f'<link href="{css}"><div><h1>Home</h1><p><img src="{image}" alt="a"></img> and <a href="{css}">style</a></p></div>', html)
+        manifest_path = save_asset_manifest(assets, self.public)
+        self.assertEqual(assets.urls, json.loads(manifest_path.read_text()))
+
+    def test_sync_replaces_outdated_fingerprints(self):
+        manifest = self.root / "assets.json"
+        sync_from_to(self.static, self.public, manifest, assets=scan_assets(self.static))
+        (self.static / "index.css").write_text("p {}")
+        assets = scan_assets(self.static)
+        result = sync_from_to(self.static, self.public, manifest, assets=assets)
+        self.assertEqual(1, len(result.removed))
+        self.assertEqual(sorted([assets.url("/index.css")[1:], assets.url("/images/a.png")[1:]]), self.files())
+
+    def test_changed_asset_rebuilds_pages(self):
+        manifest = self.root / "manifest.json"
+        generate_pages_incremental(self.content, self.template, self.public, manifest, assets=scan_assets(self.static))
+        self.assertEqual([], generate_pages_incremental(self.content, self.template, self.public, manifest, assets=scan_assets(self.static)))
+        (self.static / "index.css").write_text("p {}")
+        assets = scan_assets(self.static)
+        self.assertEqual(1, len(generate_pages_incremental(self.content, self.template, self.public, manifest, assets=assets)))
+        self.assertIn(assets.url("/index.css"), (self.public / "index.html").read_text())
+
+    def test_critical_css(self):
+        (self.static / "index.css").write_text("body { margin: 0 }\np, img { color: red }\npre { padding: 0 }")
+        self.template.write_text('<body><link href="/index.css" rel="stylesheet">{{ Content }}</body>')
+        assets = scan_assets(self.static, critical_css=True)
+        css = assets.url("/index.css")
+        html = render_markdown_page("# Home\n\ntext", self.template, assets=assets)
+        self.assertEqual(f"<body><style>body{{margin: 0}}p{{color: red}}</style><link rel=\"preload\" href=\"{css}\" as=\"style\" onload=\"this.onload=null;this.rel='stylesheet'\"><noscript><link href=\"{css}\" rel=\"stylesheet\"></noscript><div><h1>Home</h1><p>text</p></div></body>", html)
+        # a streamed page gets the whole stylesheet
+        generate_page(self.content / "index.md", self.template, self.public / "index.html", stream_threshold=0, assets=assets)
+        self.assertIn("<style>body{margin: 0}p,img{color: red}pre{padding: 0}</style>", (self.public / "index.html").read_text())
+        without = scan_assets(self.static)
+        self.assertNotEqual(without.version, assets.version)
+
+    def test_critical_css_with_block_cache(self):
+        (self.static / "index.css").write_text("p { color: red }\npre { padding: 0 }")
+        self.template.write_text('<link href="/index.css" rel="stylesheet">{{ Content }}')
+        assets = scan_assets(self.static, critical_css=True)
+        cache = BlockCache()
+        # the first render fills the cache, the second one is made of cached fragments only
+        for _ in range(2):
+            html = render_markdown_page("# Home\n\ntext", self.template, cache=cache, assets=assets)
+            self.assertIn("<style>p{color: red}</style>", html)
+        self.assertEqual(2, cache.hits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import pathlib
+import tempfile
+import unittest
+
+from async_build import generate_pages_async_recursive
+from main import generate_pages_recursive
+
+template = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+class TestAsyncBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.template = self.root / "template.html"
+        for i in range(8):
+            (self.content / f"dir{i % 3}" / f"sub{i}").mkdir(parents=True)
+            (self.content / f"dir{i % 3}" / f"sub{i}" / "index.md").write_text(f"# Page {i}\n\n* item **{i}**\n\n> quote")
+        self.template.write_text(template)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_tree(self, path):
+        return {file.relative_to(path).as_posix(): file.read_bytes() for file in path.rglob("*") if file.is_file()}
+
+    def test_identical_to_serial(self):
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        self.assertEqual([], generate_pages_async_recursive(self.content, self.template, self.root / "async", concurrency=3))
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "async"))
+
+    def test_streamed_pages(self):
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        self.assertEqual([], generate_pages_async_recursive(self.content, self.template, self.root / "async", stream_threshold=0))
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "async"))
+
+    def test_failed_pages_are_reported(self):
+        broken = self.content / "dir1" / "sub1" / "index.md"
+        broken.write_text("no title")
+        errors = generate_pages_async_recursive(self.content, self.template, self.root / "async")
+        self.assertEqual([broken], [from_path for from_path, _ in errors])
+        self.assertFalse((self.root / "async" / "dir1" / "sub1" / "index.html").exists())
+        self.assertEqual(7, len(self.read_tree(self.root / "async")))
+
+    def test_process_workers(self):
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        self.assertEqual([], generate_pages_async_recursive(self.content, self.template, self.root / "async", workers=2))
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "async"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import pathlib
+import tempfile
+import unittest
+
+from benchmark import compare_results, run_benchmark, stages, synthetic_corpus, write_corpus
+from text_parser import block_to_block_type, block_type_code, block_type_heading, extract_title, markdown_to_blocks, markdown_to_html_node
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_deterministic(self):
+        self.assertEqual(synthetic_corpus(pages=3, seed=4), synthetic_corpus(pages=3, seed=4))
+        self.assertNotEqual(synthetic_corpus(pages=3, seed=4), synthetic_corpus(pages=3, seed=5))
+
+    def test_corpus_is_valid_markdown(self):
+        for markdown in synthetic_corpus(pages=20, inline_density=0.5):
+            extract_title(markdown)
+            markdown_to_html_node(markdown).to_html()
+
+    def test_mix(self):
+        markdown = synthetic_corpus(pages=1, blocks=10, mix="code=1")[0]
+        block_types = [block_to_block_type(block) for block in markdown_to_blocks(markdown)]
+        self.assertEqual([block_type_heading] + [block_type_code] * 10, block_types)
+
+    def test_write_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_corpus(synthetic_corpus(pages=5), tmp_dir, pages_per_dir=2)
+            self.assertEqual(5, len(list(pathlib.Path(tmp_dir).rglob("*.md"))))
+            self.assertEqual(3, len(list(pathlib.Path(tmp_dir).iterdir())))
+
+    def test_run_benchmark(self):
+        results = run_benchmark(pages=2, blocks=5, repeat=1)
+        self.assertEqual(stages, list(results["stages"]))
+        self.assertEqual(2, results["meta"]["pages"])
+
+    def test_compare_results(self):
+        baseline = {"stages": {"read": {"best_s": 1.0}, "write": {"best_s": 1.0}}}
+        current = {"stages": {"read": {"best_s": 1.05}, "write": {"best_s": 1.5}, "new": {"best_s": 1.0}}}
+        self.assertEqual([("read", 1.0, 1.05, 1.05, False), ("write", 1.0, 1.5, 1.5, True)], compare_results(baseline, current, 0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from block_cache import BlockCache, block_key, entry_size, load_block_cache, renderer_version, save_block_cache
+from text_parser import markdown_to_html_node
+
+markdown = "# Title\n\nSome **bold** text\n\n* a\n* [link](url)\n\n```code```"
+
+class TestBlockCache(unittest.TestCase):
+    def test_get_put(self):
+        cache = BlockCache()
+        self.assertIsNone(cache.get("# Title"))
+        cache.put("# Title", "<h1>Title</h1>")
+        self.assertEqual("<h1>Title</h1>", cache.get("# Title"))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(entry_size("<h1>Title</h1>"), cache.size)
+
+    def test_lru_eviction(self):
+        cache = BlockCache(budget=entry_size("x" * 10) * 2)
+        cache.put("a", "x" * 10)
+        cache.put("b", "y" * 10)
+        cache.get("a")
+        cache.put("c", "z" * 10)
+        self.assertEqual([block_key("a"), block_key("c")], list(cache.entries))
+        self.assertEqual(1, cache.evictions)
+        self.assertLessEqual(cache.size, cache.budget)
+
+    def test_markdown_to_html_node_with_cache(self):
+        cache = BlockCache()
+        expected = markdown_to_html_node(markdown).to_html()
+        self.assertEqual(expected, markdown_to_html_node(markdown, cache=cache).to_html())
+        self.assertEqual(4, cache.misses)
+        self.assertEqual(expected, markdown_to_html_node(markdown, cache=cache).to_html())
+        self.assertEqual(4, cache.hits)
+
+    def test_changed_block_only_misses_once(self):
+        cache = BlockCache()
+        markdown_to_html_node(markdown, cache=cache)
+        markdown_to_html_node(markdown.replace("**bold**", "*italic*"), cache=cache)
+        self.assertEqual((3, 5), (cache.hits, cache.misses))
+
+    def test_invalid_block_is_not_cached(self):
+        cache = BlockCache()
+        self.assertRaises(Exception, markdown_to_html_node, "broken **bold", cache=cache)
+        self.assertEqual(0, len(cache))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = pathlib.Path(tmp_dir) / "cache.json"
+            cache = BlockCache()
+            markdown_to_html_node(markdown, cache=cache)
+            save_block_cache(cache, cache_path)
+            loaded = load_block_cache(cache_path)
+            self.assertEqual(list(cache.entries.items()), list(loaded.entries.items()))
+            self.assertEqual(cache.size, loaded.size)
+            self.assertEqual(2, len(load_block_cache(cache_path, budget=cache.size - 1 - entry_size("<h1>Title</h1>"))))
+
+    def test_load_other_version(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = pathlib.Path(tmp_dir) / "cache.json"
+            cache_path.write_text(json.dumps({"version": renderer_version + 1, "entries": [["key", "<p>old</p>"]]}))
+            self.assertEqual(0, len(load_block_cache(cache_path)))
+            cache_path.write_text("not json")
+            self.assertEqual(0, len(load_block_cache(cache_path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import bz2
+import gzip
+import os
+import pathlib
+import tempfile
+import unittest
+
+from compress import compress_tree, parse_codecs
+from serve import choose_variant
+
+class TestCompressTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.public = self.root / "public"
+        self.manifest = self.root / "manifest.json"
+        (self.public / "sub").mkdir(parents=True)
+        self.page = self.public / "sub" / "index.html"
+        self.page.write_text("<p>hello hello hello</p>" * 100)
+        (self.public / "small.css").write_text("p {}")
+        (self.public / "image.png").write_bytes(b"\x89PNG" * 200)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def compress(self, codec_names=["gzip"]):
+        return compress_tree(self.public, codec_names, self.manifest, min_size=64, workers=2)
+
+    def test_sidecars(self):
+        result = self.compress(["gzip", "bzip2"])
+        self.assertEqual([self.page], result.compressed)
+        self.assertEqual([self.public / "small.css"], result.skipped)
+        self.assertEqual(self.page.read_bytes(), gzip.decompress((self.public / "sub" / "index.html.gz").read_bytes()))
+        self.assertEqual(self.page.read_bytes(), bz2.decompress((self.public / "sub" / "index.html.bz2").read_bytes()))
+        self.assertFalse((self.public / "small.css.gz").exists())
+        self.assertFalse((self.public / "image.png.gz").exists())
+
+    def test_unchanged_content_is_not_compressed_again(self):
+        self.compress()
+        # rewritten with the same content, only the mtime moves
+        self.page.write_text(self.page.read_text())
+        os.utime(self.page, ns=(0, 0))
+        result = self.compress()
+        self.assertEqual([], result.compressed)
+        self.assertIn(self.page, result.unchanged)
+
+    def test_unchanged_content_keeps_its_sidecar_served(self):
+        self.compress()
+        sidecar = self.public / "sub" / "index.html.gz"
+        # the sidecar as the previous generation of an atomic build still has it
+        old_sidecar = self.root / "old.html.gz"
+        os.link(sidecar, old_sidecar)
+        old_mtime_ns = old_sidecar.stat().st_mtime_ns
+        self.page.write_text(self.page.read_text())
+        os.utime(self.page, ns=(0, 0))
+        result = self.compress()
+        self.assertIn(self.page, result.unchanged)
+        self.assertEqual(("gzip", str(sidecar)), choose_variant(str(self.page), "gzip", self.page.stat())[:2])
+        self.assertEqual(old_mtime_ns, old_sidecar.stat().st_mtime_ns)
+
+    def test_changed_content(self):
+        self.compress()
+        self.page.write_text("<p>changed changed</p>" * 100)
+        self.assertEqual([self.page], self.compress().compressed)
+        self.assertEqual(self.page.read_bytes(), gzip.decompress((self.public / "sub" / "index.html.gz").read_bytes()))
+
+    def test_stale_sidecars_are_removed(self):
+        self.compress(["gzip", "deflate"])
+        self.compress(["gzip"])
+        self.assertFalse((self.public / "sub" / "index.html.zz").exists())
+        self.page.unlink()
+        self.assertEqual([self.public / "sub" / "index.html.gz"], self.compress().removed)
+
+    def test_compressed_assets_are_kept(self):
+        archive = self.public / "downloads" / "data.tar.gz"
+        archive.parent.mkdir()
+        archive.write_bytes(gzip.compress(b"tar" * 100))
+        (self.public / "notes.txt.bz2").write_bytes(b"not a sidecar")
+        self.compress()
+        result = self.compress()
+        self.assertEqual([], result.removed)
+        self.assertTrue(archive.exists())
+        self.assertTrue((self.public / "notes.txt.bz2").exists())
+
+    def test_parse_codecs(self):
+        self.assertEqual(["gzip", "bzip2"], parse_codecs("gzip, bzip2"))
+        with self.assertRaises(Exception):
+            parse_codecs("brotli")
+
+
+if __name__ == "__main__":
+    unittest.main()
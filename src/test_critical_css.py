@@ -0,0 +1,58 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from critical_css import Stylesheet, load_stylesheet, node_tags, selector_tags, split_selectors, stylesheet_links
+from htmlnode import LeafNode, ParentNode
+
+css = """
+/* base */
+@charset "utf-8";
+body { margin: 0 }
+h1,
+h2 { color: red; }
+pre code, :not(div) > span { padding: 0 }
+a:hover { text-decoration: underline }
+.note[data-x="{"] { content: "}" }
+@media (max-width: 600px) { p { margin: 0 } ul li { padding: 0 } }
+@font-face { font-family: x; src: url(x.woff) }
+"""
+
+class TestStylesheet(unittest.TestCase):
+    def test_split_selectors(self):
+        self.assertEqual(["a:is(b, c) d", "e"], split_selectors("a:is(b, c) d , e"))
+
+    def test_selector_tags(self):
+        self.assertEqual({"pre", "code"}, selector_tags("pre > code.x"))
+        self.assertEqual({"a"}, selector_tags("a:not(p):hover"))
+        self.assertEqual({"li"}, selector_tags('[data-a="b c"] + LI'))
+        self.assertEqual(set(), selector_tags(".note::before"))
+
+    def test_subset(self):
+        stylesheet = Stylesheet(css)
+        self.assertEqual('@charset "utf-8";body{margin: 0}h1{color: red;}a:hover{text-decoration: underline}.note[data-x="{"]{content: "}"}@media (max-width: 600px){p{margin: 0}}@font-face{font-family: x; src: url(x.woff)}', stylesheet.subset({"body", "h1", "a", "p"}))
+        self.assertIn("pre code,:not(div) > span{padding: 0}", stylesheet.subset())
+        self.assertIn("ul li{padding: 0}", stylesheet.subset())
+
+    def test_node_tags(self):
+        node = ParentNode([LeafNode("x", "b"), LeafNode("y"), ParentNode([LeafNode("z", "code")], "pre")], "div")
+        self.assertEqual({"div", "b", "pre", "code"}, node_tags(node))
+        self.assertEqual({"div", "p", "em"}, node_tags(ParentNode([LeafNode("<p><em>x</em></p>")], "div")))
+
+    def test_stylesheet_links(self):
+        html = '<link href="/a.css" rel="stylesheet"><link rel="icon" href="/i.png"><link rel=\'stylesheet\' href="/p.css" media="print">'
+        self.assertEqual(["/a.css"], [href for _, href in stylesheet_links(html)])
+
+    def test_parsed_once(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stylesheet_path = pathlib.Path(tmp_dir) / "index.css"
+            stylesheet_path.write_text("p { margin: 0 }")
+            stylesheet = load_stylesheet(stylesheet_path)
+            self.assertIs(stylesheet, load_stylesheet(stylesheet_path))
+            stylesheet_path.write_text("p { margin: 1px }")
+            os.utime(stylesheet_path, ns=(1, 1))
+            self.assertEqual("p{margin: 1px}", load_stylesheet(stylesheet_path).subset())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import http.client
+import http.server
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+
+from devserver import DevSite, changed_paths, error_page, handler_for, inject_livereload, livereload_script, snapshot
+
+class TestDevSite(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.static = self.root / "static"
+        self.template = self.root / "template.html"
+        (self.content / "sub").mkdir(parents=True)
+        self.static.mkdir()
+        (self.content / "index.md").write_text("# Home")
+        (self.content / "sub" / "index.md").write_text("# Sub")
+        (self.static / "index.css").write_text("body {}")
+        self.template.write_text("<body>{{ Content }}</body>")
+        self.site = DevSite(self.content, self.static, self.template)
+        self.site.snapshot = snapshot(self.site.watched_paths())
+        self.site.rebuild()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def touch(self, path, text):
+        # bump the mtime explicitly, writes within the same timestamp tick would go unnoticed
+        path.write_text(text)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_initial_build(self):
+        self.assertEqual((b"<body><div><h1>Home</h1></div>" + livereload_script.encode() + b"</body>", "text/html; charset=utf-8"), self.site.get("/index.html"))
+        self.assertEqual((b"body {}", "text/css"), self.site.get("/index.css"))
+        self.assertIsNotNone(self.site.get("/sub/index.html"))
+
+    def test_no_changes(self):
+        self.assertEqual([], self.site.poll())
+
+    def test_page_change_rebuilds_only_that_page(self):
+        self.touch(self.content / "sub" / "index.md", "# Changed")
+        self.assertEqual(["/sub/index.html"], self.site.poll())
+        self.assertIn(b"Changed", self.site.get("/sub/index.html")[0])
+
+    def test_asset_change(self):
+        self.touch(self.static / "index.css", "p {}")
+        self.assertEqual(["/index.css"], self.site.poll())
+        self.assertEqual(b"p {}", self.site.get("/index.css")[0])
+
+    def test_template_change_rebuilds_pages(self):
+        self.touch(self.template, "<main>{{ Content }}</main>")
+        self.assertEqual(["/index.html", "/sub/index.html"], self.site.poll())
+
+    def test_new_layout_rebuilds_directory(self):
+        self.touch(self.content / "sub" / "layout.html", "<section>{{ Content }}</section>")
+        self.assertEqual(["/sub/index.html"], self.site.poll())
+        self.assertTrue(self.site.get("/sub/index.html")[0].startswith(b"<section>"))
+
+    def test_removed_files(self):
+        (self.content / "sub" / "index.md").unlink()
+        (self.static / "index.css").unlink()
+        self.assertEqual(["/index.css", "/sub/index.html"], self.site.poll())
+        self.assertIsNone(self.site.get("/sub/index.html"))
+        self.assertIsNone(self.site.get("/index.css"))
+
+    def test_broken_page_shows_error(self):
+        self.touch(self.content / "index.md", "no title")
+        self.site.poll()
+        self.assertIn(b"Build error", self.site.get("/index.html")[0])
+
+    def test_quoted_paths(self):
+        (self.static / "my image.css").write_text("img {}")
+        self.site.rebuild()
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler_for(self.site))
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        try:
+            connection.request("GET", "/my%20image.css")
+            response = connection.getresponse()
+            self.assertEqual((200, b"img {}"), (response.status, response.read()))
+        finally:
+            connection.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_version_changes(self):
+        version = self.site.version
+        self.touch(self.content / "index.md", "# Again")
+        self.site.poll()
+        self.assertNotEqual(version, self.site.wait_for_change(version, 0))
+
+
+class TestDevServerHelpers(unittest.TestCase):
+    def test_changed_paths(self):
+        old = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+        new = {"a": (1, 1), "b": (2, 1), "d": (1, 1)}
+        self.assertEqual({"b", "c", "d"}, changed_paths(old, new))
+
+    def test_error_page_is_escaped(self):
+        self.assertIn("<pre>Invalid &lt;b&gt; tag</pre>", error_page("a.md", Exception("Invalid <b> tag")))
+
+    def test_inject_livereload(self):
+        self.assertEqual("<body>x" + livereload_script + "</body>", inject_livereload("<body>x</body>"))
+        self.assertEqual("x" + livereload_script, inject_livereload("x"))
+
+
+if __name__ == "__main__":
+    unittest.main()
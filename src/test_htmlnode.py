@@ -1,3 +1,5 @@
+import io
+import sys
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -32,6 +34,10 @@ class TestHTMLNode(unittest.TestCase):
         node_repr = "HTMLNode(<a>, Some text, [HTMLNode(None, None, None, None), HTMLNode(None, I'm a child, None, None)], None)"
         self.assertEqual(node.__repr__(), node_repr)
 
+    def test_slots(self):
+        for node in (HTMLNode(), LeafNode("value"), ParentNode([LeafNode("child")], tag="p")):
+            self.assertFalse(hasattr(node, "__dict__"))
+
 
 class TestLeafNode(unittest.TestCase):
     def test_to_html_none_value(self):
@@ -93,6 +99,28 @@ class TestParentNode(unittest.TestCase):
         node_html = '<p>Child_1<a>Child_2</a><b target="Option_1" key="value">Child_3</b><div key_1="value_1" key_2="value2">Child_4<body><b>Child_5</b></body></div></p>'
         self.assertEqual(node_html, node.to_html())
 
+    def test_iter_html(self):
+        node = ParentNode(tag="p", children=[LeafNode("Child_1"), ParentNode(tag="b", children=[LeafNode("Child_2")])])
+        self.assertEqual(["<p>", "Child_1", "<b>", "Child_2", "</b>", "</p>"], list(node.iter_html()))
+
+    def test_render_to(self):
+        node = ParentNode(tag="div", props={"key": "value"}, children=[LeafNode("Child_1", tag="a"), LeafNode("Child_2")])
+        stream = io.StringIO()
+        node.render_to(stream)
+        self.assertEqual(node.to_html(), stream.getvalue())
+
+    def test_to_html_deep_nesting(self):
+        node = LeafNode("deep")
+        for _ in range(sys.getrecursionlimit() * 2):
+            node = ParentNode(tag="div", children=[node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<div><div>"))
+        self.assertEqual(len("<div></div>") * sys.getrecursionlimit() * 2 + len("deep"), len(html))
+
+    def test_to_html_nested_invalid_child(self):
+        node = ParentNode(tag="p", children=[LeafNode("fine"), ParentNode(tag="b", children=[])])
+        self.assertRaises(ValueError, node.to_html)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
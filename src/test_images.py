@@ -0,0 +1,70 @@
+import os
+import pathlib
+import struct
+import tempfile
+import unittest
+
+from assets import Assets, scan_assets
+from images import image_size, load_image_index, save_image_index
+
+png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480) + b"\x08\x02\x00\x00\x00"
+gif = b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 8
+webp_lossy = b"RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 300, 200) + b"\x00" * 4
+webp_lossless = b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f" + ((300 - 1) | (200 - 1) << 14).to_bytes(4, "little") + b"\x00" * 8
+webp_extended = b"RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x00\x00\x00\x00" + (300 - 1).to_bytes(3, "little") + (200 - 1).to_bytes(3, "little")
+jpeg = (b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+        + b"\xff\xff\xc2" + struct.pack(">HBHH", 17, 8, 120, 160) + b"\x03" + b"\x00" * 9 + b"\xff\xd9")
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, data):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def test_formats(self):
+        self.assertEqual((640, 480), image_size(self.write("a.png", png)))
+        self.assertEqual((32, 16), image_size(self.write("a.gif", gif)))
+        self.assertEqual((300, 200), image_size(self.write("a.webp", webp_lossy)))
+        self.assertEqual((300, 200), image_size(self.write("b.webp", webp_lossless)))
+        self.assertEqual((300, 200), image_size(self.write("c.webp", webp_extended)))
+        self.assertEqual((160, 120), image_size(self.write("a.jpg", jpeg)))
+
+    def test_unknown_or_broken(self):
+        self.assertIsNone(image_size(self.write("a.txt", b"hello")))
+        self.assertIsNone(image_size(self.write("b.jpg", jpeg[:26])))
+
+    def test_index(self):
+        image_path = self.write("a.png", png)
+        index_path = self.root / "index.json"
+        index = load_image_index(index_path)
+        self.assertEqual((640, 480), index.size(image_path))
+        save_image_index(index, index_path)
+        index = load_image_index(index_path)
+        self.assertEqual((640, 480), index.size(image_path))
+        self.assertFalse(index.changed)
+        # a new mtime reads the header again
+        image_path.write_bytes(gif)
+        os.utime(image_path, ns=(0, 0))
+        self.assertEqual((32, 16), index.size(image_path))
+        self.assertTrue(index.changed)
+
+    def test_image_props(self):
+        self.write("static/images/a.png", png)
+        self.write("static/index.css", b"body {}")
+        assets = scan_assets(self.root / "static", fingerprint=False, image_index=load_image_index(self.root / "index.json"))
+        self.assertEqual({}, assets.urls)
+        self.assertEqual({"src": "/images/a.png", "alt": "a", "width": "640", "height": "480", "loading": "lazy", "decoding": "async"}, assets.image_props("/images/a.png", "a"))
+        self.assertEqual({"src": "https://example.com/b.png", "alt": "b", "loading": "lazy", "decoding": "async"}, assets.image_props("https://example.com/b.png", "b"))
+        self.assertEqual({"src": "/images/a.png", "alt": "a"}, Assets().image_props("/images/a.png", "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
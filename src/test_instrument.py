@@ -0,0 +1,56 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from instrument import StageTimer, format_report, null_timer, page_stages, summarize, write_report_json
+from text_parser import markdown_to_html_node
+
+page_timings = [
+    ("content/a.md", {"read": 0.001, "inline": 0.004}),
+    ("content/b.md", {"read": 0.002, "inline": 0.010, "write": 0.001}),
+]
+
+class TestInstrument(unittest.TestCase):
+    def test_stage_timer(self):
+        timer = StageTimer()
+        timer.lap("read")
+        timer.lap("inline")
+        timer.lap("read")
+        self.assertEqual(["read", "inline"], list(timer.stages))
+        self.assertTrue(all(seconds >= 0 for seconds in timer.stages.values()))
+
+    def test_markdown_to_html_node_stages(self):
+        timer = StageTimer()
+        markdown = "# Title\n\nSome **text**\n\n* a\n* b"
+        self.assertEqual(markdown_to_html_node(markdown).to_html(), markdown_to_html_node(markdown, timer).to_html())
+        self.assertEqual({"blocks", "inline", "tree"}, set(timer.stages))
+        self.assertTrue(set(timer.stages) <= set(page_stages))
+
+    def test_null_timer(self):
+        null_timer.lap("read")
+        self.assertFalse(hasattr(null_timer, "stages"))
+
+    def test_summarize(self):
+        pages, totals = summarize(page_timings)
+        self.assertEqual(["content/b.md", "content/a.md"], [page["source"] for page in pages])
+        self.assertEqual(["inline", "read", "write"], list(totals))
+        self.assertAlmostEqual(0.014, totals["inline"])
+
+    def test_format_report(self):
+        report = format_report(page_timings, top=1)
+        self.assertIn("2 pages", report)
+        self.assertIn("content/b.md  (mostly inline)", report)
+        self.assertNotIn("content/a.md", report)
+
+    def test_write_report_json(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = pathlib.Path(tmp_dir) / "report.json"
+            write_report_json(page_timings, report_path)
+            report = json.loads(report_path.read_text())
+        self.assertEqual("content/b.md", report["pages"][0]["source"])
+        self.assertAlmostEqual(0.003, report["stages"]["read"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import pathlib
+import tempfile
+import unittest
+
+from instrument import page_stages
+from main import BuildError, copy_from_to, generate_pages_incremental, generate_pages_parallel, generate_pages_recursive, find_pages
+from sync import default_ignore_patterns, scan_files
+
+template = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.public = self.root / "public"
+        self.template = self.root / "template.html"
+        self.manifest = self.root / "manifest.json"
+        (self.content / "sub").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home\n\nhello")
+        (self.content / "sub" / "index.md").write_text("# Sub\n\nworld")
+        self.template.write_text(template)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build(self):
+        return generate_pages_incremental(self.content, self.template, self.public, self.manifest)
+
+    def test_find_pages(self):
+        pages = sorted(dest.relative_to(self.public).as_posix() for _, dest in find_pages(self.content, self.public))
+        self.assertEqual(["index.html", "sub/index.html"], pages)
+
+    def test_find_pages_from_file_index(self):
+        (self.content / "sub" / "layout.html").write_text("{{ Content }}")
+        self.assertEqual(sorted(find_pages(self.content, self.public)), list(find_pages(self.content, self.public, scan_files(self.content))))
+
+    def test_copy_from_file_index(self):
+        static = self.root / "static"
+        (static / "images").mkdir(parents=True)
+        (static / "images" / "a.png").write_bytes(b"png")
+        (static / "index.css~").write_text("backup")
+        copy_from_to(static, self.public, files=scan_files(static, default_ignore_patterns))
+        self.assertEqual(["images/a.png"], [path.relative_to(self.public).as_posix() for path in self.public.rglob("*") if path.is_file()])
+
+    def test_first_build_generates_everything(self):
+        self.assertEqual(2, len(self.build()))
+        self.assertEqual("<title>Home</title><body><div><h1>Home</h1><p>hello</p></div></body>", (self.public / "index.html").read_text())
+
+    def test_same_output_as_full_build(self):
+        self.build()
+        incremental = (self.public / "sub" / "index.html").read_text()
+        generate_pages_recursive(self.content, self.template, self.root / "full")
+        self.assertEqual((self.root / "full" / "sub" / "index.html").read_text(), incremental)
+
+    def test_unchanged_build_is_noop(self):
+        self.build()
+        self.assertEqual([], self.build())
+
+    def test_changed_source(self):
+        self.build()
+        (self.content / "sub" / "index.md").write_text("# Sub\n\nchanged")
+        self.assertEqual([self.public / "sub" / "index.html"], self.build())
+        self.assertIn("changed", (self.public / "sub" / "index.html").read_text())
+
+    def test_changed_template(self):
+        self.build()
+        self.template.write_text("<h2>{{ Title }}</h2>{{ Content }}")
+        self.assertEqual(2, len(self.build()))
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        (self.public / "index.html").unlink()
+        self.assertEqual([self.public / "index.html"], self.build())
+
+    def test_removed_source(self):
+        self.build()
+        (self.content / "sub" / "index.md").unlink()
+        self.build()
+        self.assertFalse((self.public / "sub").exists())
+        self.assertTrue((self.public / "index.html").exists())
+
+    def test_layout_override(self):
+        (self.content / "sub" / "layout.html").write_text("<main>{{ Content }}</main>")
+        self.build()
+        self.assertEqual("<main><div><h1>Sub</h1><p>world</p></div></main>", (self.public / "sub" / "index.html").read_text())
+        self.assertFalse((self.public / "sub" / "layout.html").exists())
+        (self.content / "sub" / "layout.html").write_text("<section>{{ Content }}</section>")
+        self.assertEqual([self.public / "sub" / "index.html"], self.build())
+
+    def test_template_values(self):
+        self.template.write_text("{{ Site }}: {{ Title }}")
+        generate_pages_incremental(self.content, self.template, self.public, self.manifest, values={"Site": "Fan Club"})
+        self.assertEqual("Fan Club: Home", (self.public / "index.html").read_text())
+        self.assertEqual([], generate_pages_incremental(self.content, self.template, self.public, self.manifest, values={"Site": "Fan Club"}))
+        self.assertEqual(2, len(generate_pages_incremental(self.content, self.template, self.public, self.manifest, values={"Site": "Club"})))
+
+    def test_failed_page_is_retried(self):
+        (self.content / "broken.md").write_text("no title here")
+        with self.assertRaises(BuildError):
+            self.build()
+        (self.content / "broken.md").write_text("# Fixed")
+        self.assertEqual([self.public / "broken.html"], self.build())
+
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.template = self.root / "template.html"
+        for i in range(6):
+            (self.content / f"dir{i}").mkdir(parents=True)
+            (self.content / f"dir{i}" / "index.md").write_text(f"# Page {i}\n\n* item **{i}**\n* [link](/dir{i})")
+        self.template.write_text(template)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_tree(self, path):
+        return {file.relative_to(path).as_posix(): file.read_bytes() for file in path.rglob("*") if file.is_file()}
+
+    def test_identical_to_serial(self):
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        errors = generate_pages_parallel(self.content, self.template, self.root / "parallel", workers=3)
+        self.assertEqual([], errors)
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "parallel"))
+
+    def test_timings(self):
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        timings = []
+        errors = generate_pages_parallel(self.content, self.template, self.root / "timed", workers=2, timings=timings)
+        self.assertEqual([], errors)
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "timed"))
+        self.assertEqual(6, len(timings))
+        self.assertTrue(all(set(stages) == set(page_stages) - {"cache", "minify"} for _, stages in timings))
+
+    def test_streaming_identical_to_in_memory(self):
+        (self.content / "dir0" / "index.md").write_text("intro\n\n# Late title\n\n```\ncode\n```\n\n> quote")
+        generate_pages_recursive(self.content, self.template, self.root / "serial")
+        generate_pages_recursive(self.content, self.template, self.root / "streamed", stream_threshold=0)
+        self.assertEqual(self.read_tree(self.root / "serial"), self.read_tree(self.root / "streamed"))
+
+    def test_streaming_failure_leaves_no_output(self):
+        (self.content / "dir0" / "index.md").write_text("# Title\n\ntext\n\n**unclosed")
+        errors = generate_pages_parallel(self.content, self.template, self.root / "streamed", workers=1, stream_threshold=0)
+        self.assertEqual([self.content / "dir0" / "index.md"], [from_path for from_path, _ in errors])
+        self.assertFalse((self.root / "streamed" / "dir0" / "index.html").exists())
+
+    def test_minify(self):
+        self.template.write_text("<html>\n  <head>\n    <title>{{ Title }}</title>\n  </head>\n  <body>{{ Content }}</body>\n</html>\n")
+        (self.content / "dir0" / "index.md").write_text("# Title\n\n```\n  indented   code\n```")
+        generate_pages_recursive(self.content, self.template, self.root / "minified", minify=True)
+        generate_pages_recursive(self.content, self.template, self.root / "streamed", stream_threshold=0, minify=True)
+        timings = []
+        generate_pages_recursive(self.content, self.template, self.root / "timed", timings=timings, minify=True)
+        minified = self.read_tree(self.root / "minified")
+        self.assertEqual(b"<html>\n<head>\n<title>Title</title>\n</head>\n<body><div><h1>Title</h1><pre><code>\n  indented   code\n</code></pre></div></body>\n</html>\n", minified["dir0/index.html"])
+        self.assertEqual(minified, self.read_tree(self.root / "streamed"))
+        self.assertEqual(minified, self.read_tree(self.root / "timed"))
+        self.assertTrue(all("minify" in stages for _, stages in timings))
+
+    def test_errors_are_collected(self):
+        (self.content / "dir2" / "index.md").write_text("missing title")
+        (self.content / "dir4" / "index.md").write_text("broken *italic")
+        for workers in (1, 2):
+            errors = generate_pages_parallel(self.content, self.template, self.root / f"public{workers}", workers=workers)
+            self.assertEqual([self.content / "dir2" / "index.md", self.content / "dir4" / "index.md"], [from_path for from_path, _ in errors])
+            self.assertEqual(4, len(self.read_tree(self.root / f"public{workers}")))
+
+
+if __name__ == "__main__":
+    unittest.main()
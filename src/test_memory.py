@@ -0,0 +1,91 @@
+import json
+import pathlib
+import tempfile
+import tracemalloc
+import unittest
+
+from instrument import StageTimer, null_timer
+from main import generate_page, generate_pages_parallel
+from memory import MemoryBudgetExceeded, MemoryReport, format_bytes, format_memory_report, write_memory_report_json
+
+class TestMemoryReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.public = self.root / "public"
+        self.template = self.root / "template.html"
+        self.content.mkdir()
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+        (self.content / "small.md").write_text("# Small\n\ntext")
+        (self.content / "big.md").write_text("# Big\n\n" + "\n\n".join(f"Paragraph **{i}** with [a link](/x{i})" for i in range(2000)))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_format_bytes(self):
+        self.assertEqual(["12 B", "1.5 KiB", "3.0 MiB", "2048.0 GiB"], [format_bytes(size) for size in (12, 1536, 3 * 1024 ** 2, 2 * 1024 ** 4)])
+
+    def test_page_memory(self):
+        report = MemoryReport()
+        try:
+            timer = StageTimer()
+            page_memory = report.track(timer)
+            data = [str(i) * 10 for i in range(10000)]
+            page_memory.lap("tree")
+            del data
+            page_memory.lap("write")
+        finally:
+            report.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(page_memory.stages["tree"], 100000)
+        self.assertLess(page_memory.stages["write"], page_memory.stages["tree"])
+        self.assertEqual(["tree", "write"], list(timer.stages))
+
+    def test_budget(self):
+        report = MemoryReport(budget=1000)
+        try:
+            page_memory = report.track(null_timer)
+            data = "x" * 10000
+            with self.assertRaises(MemoryBudgetExceeded) as context:
+                page_memory.lap("read")
+        finally:
+            report.stop()
+        self.assertEqual("read", context.exception.stage)
+        self.assertGreater(context.exception.peak, len(data))
+
+    def test_report_worst_first(self):
+        report = MemoryReport()
+        try:
+            generate_pages_parallel(self.content, self.template, self.public, workers=1, memory=report)
+        finally:
+            report.stop()
+        pages = report.summarize()
+        self.assertEqual([str(self.content / "big.md"), str(self.content / "small.md")], [page["source"] for page in pages])
+        self.assertTrue({"read", "blocks", "inline", "tree", "write"} <= set(pages[0]["stages"]))
+        self.assertIn("big.md", format_memory_report(report).splitlines()[3])
+        write_memory_report_json(report, self.root / "memory.json")
+        self.assertEqual(pages[0]["peak"], json.loads((self.root / "memory.json").read_text())["pages"][0]["peak"])
+
+    def test_over_budget_fails(self):
+        report = MemoryReport(budget=64 * 1024)
+        try:
+            errors = generate_pages_parallel(self.content, self.template, self.public, workers=1, memory=report)
+        finally:
+            report.stop()
+        self.assertEqual([self.content / "big.md"], [from_path for from_path, _ in errors])
+        self.assertFalse((self.public / "big.html").exists())
+        self.assertTrue((self.public / "small.html").exists())
+
+    def test_over_budget_streams(self):
+        generate_page(self.content / "big.md", self.template, self.root / "expected.html")
+        report = MemoryReport(budget=256 * 1024, over_budget="stream")
+        try:
+            generate_page(self.content / "big.md", self.template, self.public / "big.html", memory=report)
+        finally:
+            report.stop()
+        self.assertEqual((self.root / "expected.html").read_text(), (self.public / "big.html").read_text())
+        self.assertEqual([True], [page["streamed"] for page in report.summarize()])
+
+if __name__ == "__main__":
+    unittest.main()
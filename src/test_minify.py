@@ -0,0 +1,40 @@
+import io
+import unittest
+
+from minify import HtmlMinifier
+
+def minify(html, chunk_size=None):
+    stream = io.StringIO()
+    minifier = HtmlMinifier(stream, buffer_size=1)
+    chunk_size = chunk_size or len(html) or 1
+    for pos in range(0, len(html), chunk_size):
+        minifier.write(html[pos:pos + chunk_size])
+    minifier.finish()
+    return stream.getvalue(), minifier.saved
+
+class TestHtmlMinifier(unittest.TestCase):
+    def test_collapses_whitespace(self):
+        self.assertEqual(("<ul>\n<li>a b</li>\n<li> c </li>\n</ul>", 12), minify("<ul>\n\n    <li>a   b</li>\n    <li>\tc  </li>\n</ul>"))
+
+    def test_keeps_raw_elements(self):
+        html = "<pre>  a\n\n  b</pre>  <textarea>x  y</textarea> <SCRIPT>if (a  <  b) {}</script >\t<style>p  {}</style>"
+        self.assertEqual(html.replace("</pre>  <", "</pre> <").replace(">\t<", "> <"), minify(html)[0])
+
+    def test_keeps_attribute_values_and_comments(self):
+        html = '<p title="a   b > c"  class=\'x  y\'>t  u</p><!--  kept  -->'
+        self.assertEqual('<p title="a   b > c"  class=\'x  y\'>t u</p><!--  kept  -->', minify(html)[0])
+
+    def test_keeps_no_break_spaces(self):
+        self.assertEqual(("a\xa0\xa0 b", 1), minify("a\xa0\xa0  b"))
+
+    def test_lone_angle_bracket(self):
+        self.assertEqual(("a < b > c", 2), minify("a  < b >  c"))
+
+    def test_chunks_cut_anywhere(self):
+        html = "<div>\n  <pre class=\"x  y\">  code\n</pre >\n  <!-- a  b -->  <a href='/x  y'>link   text</a>\n</div>\n"
+        expected = minify(html)
+        for chunk_size in range(1, len(html)):
+            self.assertEqual(expected, minify(html, chunk_size))
+
+if __name__ == "__main__":
+    unittest.main()
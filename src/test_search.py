@@ -0,0 +1,71 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from main import find_pages
+from search import build_search_index, page_terms, shard_name
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.public = self.root / "public"
+        self.manifest = self.root / "search.json"
+        (self.content / "rings").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Welcome home\n\nThe **shire** is green")
+        (self.content / "rings" / "index.md").write_text("# Rings\n\nOne ring to rule them all, said the [shire](/shire) folk")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build(self):
+        return build_search_index(find_pages(self.content, self.public), self.public, self.manifest)
+
+    def lookup(self, term):
+        meta = json.loads((self.public / "search" / "meta.json").read_text())
+        shard_path = self.public / "search" / "terms" / f"{shard_name(term, meta['prefix_length'])}.json"
+        postings = json.loads(shard_path.read_text()).get(term, []) if shard_path.exists() else []
+        return [(meta["docs"][doc_id][0], score) for doc_id, score in postings]
+
+    def test_page_terms(self):
+        title, terms = page_terms("# Big *ring*\n\nA ring, a `code` and ![alt text](/a.png)")
+        self.assertEqual("Big *ring*", title)
+        self.assertEqual({"big": 6, "ring": 7, "code": 1, "and": 1, "alt": 1, "text": 1}, terms)
+
+    def test_index(self):
+        self.build()
+        self.assertEqual([("/", 1), ("/rings/", 1)], self.lookup("shire"))
+        # the title weighs more than the text
+        self.assertEqual([("/rings/", 6)], self.lookup("rings"))
+        self.assertEqual([], self.lookup("mordor"))
+
+    def test_incremental_update(self):
+        self.build()
+        result = self.build()
+        self.assertEqual(([], []), (result.indexed, result.written))
+        (self.content / "index.md").write_text("# Welcome home\n\nThe **shire** is gone")
+        result = self.build()
+        self.assertEqual([self.content / "index.md"], result.indexed)
+        # meta.json keeps its content, "gone" lands in an existing shard and "green" was the only term of its own
+        self.assertEqual(["go.json"], [path.name for path in result.written])
+        self.assertEqual(["gr.json"], [path.name for path in result.removed])
+        self.assertEqual([], self.lookup("green"))
+        self.assertEqual([("/", 1)], self.lookup("gone"))
+
+    def test_removed_page(self):
+        self.build()
+        (self.content / "rings" / "index.md").unlink()
+        result = self.build()
+        self.assertIn(self.public / "search" / "terms" / "ru.json", result.removed)
+        self.assertEqual([("/", 1)], self.lookup("shire"))
+
+    def test_shard_name(self):
+        self.assertEqual("ri", shard_name("ring"))
+        self.assertEqual("_c3a9", shard_name("été", 1))
+        self.assertEqual("_5f61", shard_name("_a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import gzip
+import http.client
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+
+from serve import FileCache, accepted_encodings, make_server, resolve_path
+
+class TestStaticServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.public = pathlib.Path(self.tmp_dir.name)
+        (self.public / "sub").mkdir()
+        (self.public / "index.html").write_text("<p>home</p>")
+        (self.public / "index.html.gz").write_bytes(gzip.compress(b"<p>home</p>"))
+        # like compress.write_sidecar does
+        mtime_ns = (self.public / "index.html").stat().st_mtime_ns
+        os.utime(self.public / "index.html.gz", ns=(mtime_ns, mtime_ns))
+        (self.public / "sub" / "index.html").write_text("<p>sub</p>")
+        self.large = b"x" * 200_000
+        (self.public / "large.css").write_bytes(self.large)
+        self.server = make_server(str(self.public), 0, FileCache(budget=1024, max_file_size=512), bind="127.0.0.1")
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def get(self, path, headers={}, method="GET"):
+        self.connection.request(method, path, headers=headers)
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_get_with_keep_alive(self):
+        response, body = self.get("/index.html")
+        self.assertEqual((200, b"<p>home</p>"), (response.status, body))
+        self.assertEqual("text/html", response.getheader("Content-Type"))
+        self.assertIsNotNone(response.getheader("Last-Modified"))
+        # the same connection serves the next request
+        response, body = self.get("/sub/")
+        self.assertEqual((200, b"<p>sub</p>"), (response.status, body))
+
+    def test_conditional_requests(self):
+        response, _ = self.get("/sub/index.html")
+        etag = response.getheader("ETag")
+        response, body = self.get("/sub/index.html", {"If-None-Match": etag})
+        self.assertEqual((304, b""), (response.status, body))
+        response, _ = self.get("/sub/index.html", {"If-Modified-Since": response.getheader("Last-Modified")})
+        self.assertEqual(304, response.status)
+        response, _ = self.get("/sub/index.html", {"If-None-Match": '"other"'})
+        self.assertEqual(200, response.status)
+
+    def test_precompressed_variant(self):
+        response, body = self.get("/", {"Accept-Encoding": "br, gzip;q=0.8"})
+        self.assertEqual("gzip", response.getheader("Content-Encoding"))
+        self.assertEqual(b"<p>home</p>", gzip.decompress(body))
+        self.assertEqual("Accept-Encoding", response.getheader("Vary"))
+        response, body = self.get("/", {"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(b"<p>home</p>", body)
+
+    def test_stale_variant_is_not_served(self):
+        (self.public / "index.html").write_text("<p>new home</p>")
+        os.utime(self.public / "index.html", ns=(1, 1))
+        response, body = self.get("/", {"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(b"<p>new home</p>", body)
+
+    def test_large_file(self):
+        response, body = self.get("/large.css")
+        self.assertEqual(self.large, body)
+        response, body = self.get("/large.css", method="HEAD")
+        self.assertEqual((str(len(self.large)), b""), (response.getheader("Content-Length"), body))
+
+    def test_fingerprinted_files_are_immutable(self):
+        (self.public / "index.0123456789.css").write_text("p {}")
+        self.assertIn("immutable", self.get("/index.0123456789.css")[0].getheader("Cache-Control"))
+        self.assertEqual("no-cache", self.get("/large.css")[0].getheader("Cache-Control"))
+
+    def test_missing_and_redirects(self):
+        self.assertEqual(404, self.get("/missing.html")[0].status)
+        self.assertEqual(404, self.get("/a%00b")[0].status)
+        response, _ = self.get("/sub")
+        self.assertEqual((301, "/sub/"), (response.status, response.getheader("Location")))
+
+    def test_changed_file_is_not_served_from_cache(self):
+        self.get("/sub/index.html")
+        (self.public / "sub" / "index.html").write_text("<p>changed sub</p>")
+        self.assertEqual(b"<p>changed sub</p>", self.get("/sub/index.html")[1])
+
+
+class TestServeHelpers(unittest.TestCase):
+    def test_resolve_path(self):
+        self.assertEqual("public/a/b.html", resolve_path("public", "/a/./b.html?x=1"))
+        self.assertEqual("public/etc/passwd", resolve_path("public", "/../../etc/passwd"))
+        self.assertEqual("public/a b", resolve_path("public", "/a%20b"))
+        self.assertIsNone(resolve_path("public", "/a%00b"))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(["br", "gzip"], accepted_encodings("gzip;q=0.5, br, deflate;q=0"))
+        self.assertEqual([], accepted_encodings(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
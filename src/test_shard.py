@@ -0,0 +1,91 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from main import generate_pages_recursive
+from shard import MergeError, merge_shards, parse_shard, partition, prepare_shard, shard_files, write_shard_manifest
+from sync import scan_files
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.content = self.root / "content"
+        self.shards = self.root / "shards"
+        self.template = self.root / "template.html"
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+        for name, size in (("index.md", 50), ("a/index.md", 400), ("b/index.md", 300), ("c/index.md", 200), ("c/d/index.md", 100)):
+            path = self.content / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("# Page\n\n" + "x" * size)
+        (self.content / "c" / "layout.html").write_text("<main>{{ Content }}</main>")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build(self, index, count):
+        content_files = scan_files(self.content)
+        dest = prepare_shard(self.shards, index)
+        generate_pages_recursive(self.content, self.template, dest, files=shard_files(content_files, index, count))
+        if index == 1:
+            (dest / "style.css").write_text("body {}")
+        write_shard_manifest(self.shards, index, count, content_files, index == 1)
+
+    def test_parse_shard(self):
+        self.assertEqual((2, 4), parse_shard("2/4"))
+        for shard in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(Exception):
+                parse_shard(shard)
+
+    def test_partition_balances_sizes(self):
+        shards = partition(scan_files(self.content), 2)
+        self.assertEqual([["a/index.md", "c/d/index.md", "index.md"], ["b/index.md", "c/index.md"]], shards)
+        self.assertEqual(shards, partition(scan_files(self.content), 2))
+
+    def test_shard_keeps_layouts(self):
+        files = shard_files(scan_files(self.content), 2, 2)
+        self.assertEqual({"b/index.md", "c/index.md", "c/layout.html"}, set(files))
+
+    def test_merge(self):
+        for index in (1, 2, 3):
+            self.build(index, 3)
+        public = self.root / "public"
+        self.assertEqual(6, merge_shards(self.shards, public))
+        self.assertEqual({"index.html", "a/index.html", "b/index.html", "c/index.html", "c/d/index.html", "style.css"}, set(scan_files(public)))
+        self.assertIn("<main>", (public / "c" / "d" / "index.html").read_text())
+
+    def test_missing_shard(self):
+        self.build(1, 2)
+        with self.assertRaises(MergeError) as context:
+            merge_shards(self.shards, self.root / "public")
+        self.assertIn("shard 2/2 is missing", str(context.exception))
+        self.assertFalse((self.root / "public").exists())
+
+    def test_missing_and_duplicate_files(self):
+        self.build(1, 2)
+        self.build(2, 2)
+        (self.shards / "2" / "b" / "index.html").unlink()
+        manifest_path = self.shards / "2.json"
+        manifest = json.loads(manifest_path.read_text())
+        manifest["files"]["style.css"] = 7
+        manifest["pages"].append("index.md")
+        manifest_path.write_text(json.dumps(manifest))
+        (self.shards / "2" / "style.css").write_text("body {}")
+        with self.assertRaises(MergeError) as context:
+            merge_shards(self.shards, self.root / "public")
+        problems = context.exception.problems
+        self.assertIn("page index.md was built by shards 1 and 2", problems)
+        self.assertIn("style.css is in shards 1 and 2", problems)
+        self.assertIn(f"{self.shards / '2' / 'b' / 'index.html'} is missing or incomplete", problems)
+
+    def test_different_trees(self):
+        self.build(1, 2)
+        (self.content / "e.md").write_text("# New")
+        self.build(2, 2)
+        with self.assertRaises(MergeError) as context:
+            merge_shards(self.shards, self.root / "public")
+        self.assertIn("the shards were built from different content trees or shard counts", context.exception.problems)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from main import BuildError, generate_pages_incremental, open_output
+from manifest import save_manifest
+from staging import generation_numbers, prepare_staging, prune_tree, swap_in
+
+class TestStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.public = self.root / "public"
+        self.generations = self.root / "generations"
+        (self.public / "sub").mkdir(parents=True)
+        (self.public / "index.html").write_text("home")
+        (self.public / "sub" / "index.html").write_text("sub")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_staging_links_live_files(self):
+        staging = prepare_staging(self.public, self.generations)
+        self.assertEqual("sub", (staging / "sub" / "index.html").read_text())
+        self.assertTrue(os.path.samefile(self.public / "index.html", staging / "index.html"))
+
+    def test_writes_leave_live_files_alone(self):
+        staging = prepare_staging(self.public, self.generations)
+        with open_output(staging / "index.html") as dest_file:
+            dest_file.write("new home")
+        self.assertEqual("home", (self.public / "index.html").read_text())
+        self.assertEqual("new home", (staging / "index.html").read_text())
+
+    def test_prune_tree(self):
+        staging = prepare_staging(self.public, self.generations)
+        self.assertEqual([staging / "sub" / "index.html"], prune_tree(staging, {"index.html"}))
+        self.assertFalse((staging / "sub").exists())
+
+    def test_swap_in(self):
+        staging = prepare_staging(self.public, self.generations)
+        (staging / "index.html").unlink()
+        generation = swap_in(staging, self.public, self.generations)
+        self.assertTrue(self.public.is_symlink())
+        self.assertEqual(generation.resolve(), self.public.resolve())
+        self.assertFalse((self.public / "index.html").exists())
+        # the plain directory of the first build is kept as the previous generation
+        self.assertEqual([1, 2], generation_numbers(self.generations))
+        self.assertTrue((self.generations / "1" / "index.html").exists())
+
+    def test_old_generations_are_removed(self):
+        for _ in range(3):
+            swap_in(prepare_staging(self.public, self.generations), self.public, self.generations, keep=1)
+        self.assertEqual([3, 4], generation_numbers(self.generations))
+        self.assertEqual("home", (self.public / "index.html").read_text())
+
+    def test_failed_incremental_build_keeps_manifest(self):
+        content = self.root / "content"
+        content.mkdir()
+        template = self.root / "template.html"
+        template.write_text("<title>{{ Title }}</title>")
+        manifest = self.root / "manifest.json"
+        (content / "index.md").write_text("# Old")
+
+        def build():
+            # what main does with --incremental --atomic
+            staging = prepare_staging(self.public, self.generations)
+            pending_manifest = {}
+            generate_pages_incremental(content, template, staging, manifest, pending_manifest=pending_manifest)
+            swap_in(staging, self.public, self.generations)
+            save_manifest(manifest, pending_manifest)
+
+        build()
+        (content / "index.md").write_text("# New")
+        (content / "broken.md").write_text("no title")
+        with self.assertRaises(BuildError):
+            build()
+        self.assertEqual("<title>Old</title>", (self.public / "index.html").read_text())
+        (content / "broken.md").unlink()
+        build()
+        self.assertEqual("<title>New</title>", (self.public / "index.html").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from sync import default_ignore_patterns, remove_output, scan_files, sync_from_to
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.static = self.root / "static"
+        self.public = self.root / "public"
+        self.manifest = self.root / "assets.json"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "logo.png").write_bytes(b"\x89PNG logo")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def sync(self, **kwargs):
+        return sync_from_to(self.static, self.public, self.manifest, **kwargs)
+
+    def test_scan_files(self):
+        self.assertEqual(["images/logo.png", "index.css"], sorted(scan_files(self.static)))
+
+    def test_scan_files_ignore_patterns(self):
+        (self.static / ".index.css.swp").write_text("swap")
+        (self.static / "index.css~").write_text("backup")
+        (self.static / "drafts").mkdir()
+        (self.static / "drafts" / "a.css").write_text("a {}")
+        self.assertEqual(["images/logo.png", "index.css"], sorted(scan_files(self.static, default_ignore_patterns + ["drafts"])))
+
+    def test_scan_files_follows_symlinked_directories(self):
+        shared = self.root / "shared"
+        shared.mkdir()
+        (shared / "a.css").write_text("a {}")
+        (self.static / "shared").symlink_to(shared)
+        (self.static / "also-shared").symlink_to(shared)
+        # links back to a directory it is in, walked once
+        (shared / "loop").symlink_to(self.static)
+        (self.static / "images" / "up").symlink_to(self.static / "images")
+        self.assertEqual(["also-shared/a.css", "images/logo.png", "index.css", "shared/a.css"], sorted(scan_files(self.static)))
+
+    def test_first_sync_copies_everything(self):
+        result = self.sync()
+        self.assertEqual(2, len(result.copied))
+        self.assertEqual("body {}", (self.public / "index.css").read_text())
+        self.assertEqual(b"\x89PNG logo", (self.public / "images" / "logo.png").read_bytes())
+
+    def test_unchanged_files_are_skipped(self):
+        self.sync()
+        result = self.sync()
+        self.assertEqual([], result.copied)
+        self.assertEqual(2, len(result.unchanged))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        (self.static / "index.css").write_text("body { color: red; }")
+        result = self.sync()
+        self.assertEqual([self.public / "index.css"], result.copied)
+        self.assertEqual("body { color: red; }", (self.public / "index.css").read_text())
+
+    def test_checksum_skips_touched_file(self):
+        self.sync()
+        stat = (self.static / "index.css").stat()
+        os.utime(self.static / "index.css", ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        self.assertEqual([], self.sync(checksum=True).copied)
+        self.assertEqual([], self.sync().copied)
+
+    def test_stale_files_are_removed_but_pages_kept(self):
+        self.sync()
+        (self.public / "index.html").write_text("<p>generated page</p>")
+        (self.static / "images" / "logo.png").unlink()
+        result = self.sync()
+        self.assertEqual([self.public / "images" / "logo.png"], result.removed)
+        self.assertFalse((self.public / "images").exists())
+        self.assertTrue((self.public / "index.html").exists())
+
+    def test_hardlink(self):
+        self.sync(link=True)
+        self.assertTrue(os.path.samefile(self.static / "index.css", self.public / "index.css"))
+        self.assertEqual([], self.sync(link=True).copied)
+
+    def test_parallel_copy(self):
+        for i in range(20):
+            (self.static / "images" / f"{i}.png").write_bytes(bytes([i]) * 100)
+        self.assertEqual(22, len(self.sync(workers=4).copied))
+        self.assertEqual(bytes([7]) * 100, (self.public / "images" / "7.png").read_bytes())
+
+    def test_remove_output(self):
+        (self.public / "a" / "b").mkdir(parents=True)
+        (self.public / "a" / "keep.html").write_text("")
+        (self.public / "a" / "b" / "page.html").write_text("")
+        remove_output(self.public / "a" / "b" / "page.html", self.public)
+        self.assertFalse((self.public / "a" / "b").exists())
+        self.assertTrue((self.public / "a" / "keep.html").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
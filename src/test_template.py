@@ -0,0 +1,78 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from sync import scan_files
+from template import Placeholder, compile_template, load_template, render_template_to_string, resolve_layout
+
+class TestTemplate(unittest.TestCase):
+    def test_compile_template(self):
+        segments = compile_template("<title>{{ Title }}</title>{{Content}}!")
+        expected = ["<title>", Placeholder("Title", "{{ Title }}"), "</title>", Placeholder("Content", "{{Content}}"), "!"]
+        self.assertEqual(expected, segments)
+
+    def test_compile_template_no_placeholders(self):
+        self.assertEqual(["<p>static</p>"], compile_template("<p>static</p>"))
+        self.assertEqual([], compile_template(""))
+
+    def test_render(self):
+        segments = compile_template("<h1>{{ Title }}</h1>{{ Content }}<footer>{{ Title }}</footer>")
+        rendered = render_template_to_string(segments, {"Title": "Home", "Content": "<p>text</p>"})
+        self.assertEqual("<h1>Home</h1><p>text</p><footer>Home</footer>", rendered)
+
+    def test_render_callable(self):
+        segments = compile_template("[{{ Content }}]")
+        rendered = render_template_to_string(segments, {"Content": lambda stream: stream.write("streamed")})
+        self.assertEqual("[streamed]", rendered)
+
+    def test_render_unknown_placeholder(self):
+        segments = compile_template("{{ Title }} {{ Unknown }}")
+        self.assertEqual("Home {{ Unknown }}", render_template_to_string(segments, {"Title": "Home"}))
+
+    def test_render_value_is_not_reparsed(self):
+        segments = compile_template("{{ Title }}|{{ Content }}")
+        self.assertEqual("{{ Content }}|body", render_template_to_string(segments, {"Title": "{{ Content }}", "Content": "body"}))
+
+
+class TestTemplateFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_template_cached(self):
+        template_path = self.root / "template.html"
+        template_path.write_text("{{ Title }}")
+        self.assertIs(load_template(template_path), load_template(template_path))
+
+    def test_load_template_reloads_changes(self):
+        template_path = self.root / "template.html"
+        template_path.write_text("{{ Title }}")
+        first = load_template(template_path)
+        template_path.write_text("<b>{{ Title }}</b>")
+        stat = template_path.stat()
+        os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertNotEqual(first, load_template(template_path))
+
+    def test_resolve_layout(self):
+        content = self.root / "content"
+        (content / "blog" / "2024").mkdir(parents=True)
+        (content / "docs").mkdir()
+        (content / "blog" / "layout.html").write_text("{{ Content }}")
+        default = self.root / "template.html"
+        self.assertEqual(default, resolve_layout(content / "index.md", content, default))
+        self.assertEqual(default, resolve_layout(content / "docs" / "index.md", content, default))
+        self.assertEqual((content / "blog" / "layout.html").resolve(), resolve_layout(content / "blog" / "index.md", content, default))
+        self.assertEqual((content / "blog" / "layout.html").resolve(), resolve_layout(content / "blog" / "2024" / "post.md", content, default))
+        # the same answers from a file index, without looking at the disk
+        (content / "blog" / "2024" / "post.md").write_text("# Post")
+        files = scan_files(content)
+        self.assertEqual(default, resolve_layout(content / "docs" / "index.md", content, default, files))
+        self.assertEqual(content / "blog" / "layout.html", resolve_layout(content / "blog" / "2024" / "post.md", content, default, files))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from textnode import *
@@ -162,6 +163,40 @@ class TestTextParser(unittest.TestCase):
         ]
         self.assertEqual(expected, text_to_textnodes(text))
 
+    def test_text_to_textnodes_legacy(self):
+        text = "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+        self.assertEqual(text_to_textnodes_legacy(text), text_to_textnodes(text, legacy=True))
+        self.assertEqual(text_to_textnodes_legacy(text), text_to_textnodes(text))
+
+    def test_text_to_textnodes_matches_legacy(self):
+        texts = [
+            "",
+            "plain text",
+            "a****b",
+            "**bold** *italic* `code` **more bold**",
+            "[first link_t](first link) ![first image](first image link)![second image](second image link) [second link text](second link)   ![third image](third image link)",
+            "**bold** [link](url) *italic* ![image](src)",
+            "![x [y](z)](w) text",
+            "`code` next to [link](url)",
+            "[broken](link ![image](src)",
+        ]
+        for text in texts:
+            self.assertEqual(text_to_textnodes_legacy(text), text_to_textnodes(text))
+
+    def test_text_to_textnodes_invalid_delimiter(self):
+        self.assertRaises(Exception, text_to_textnodes, "[link](url) **bold*")
+        self.assertRaises(Exception, text_to_textnodes, "this is `broken")
+
+    def test_text_to_textnodes_image_before_same_link(self):
+        # the legacy passes split links at the first textual occurrence and turn the image into a link
+        text = "![same](url) and [same](url)"
+        expected = [
+            TextNode("same", text_type_image, "url"),
+            TextNode(" and ", text_type_text),
+            TextNode("same", text_type_link, "url"),
+        ]
+        self.assertEqual(expected, text_to_textnodes(text))
+
     def test_markdown_to_blocks_single_block(self):
         input = "# This is just a single block"
         result = ["# This is just a single block"]
@@ -389,6 +424,63 @@ Here is some *intro* text.
     def test_extract_title_no_header(self):
         input = "## Here will be no header\n\njust text"
         self.assertRaises(Exception, extract_title, input)
+    def test_scan_markdown(self):
+        input = "# Title\n\n## Sub\n\n* a\n- b\n\n1. one\n2. two\n\n> quote\n> more\n\n```code```\n\ntext"
+        expected = [
+            ScannedBlock("# Title", block_type_heading, ["Title"], 1),
+            ScannedBlock("## Sub", block_type_heading, ["Sub"], 2),
+            ScannedBlock("* a\n- b", block_type_unordered_list, ["a", "b"]),
+            ScannedBlock("1. one\n2. two", block_type_ordered_list, ["one", "two"]),
+            ScannedBlock("> quote\n> more", block_type_quote, ["quote\nmore"]),
+            ScannedBlock("```code```", block_type_code, ["code"]),
+            ScannedBlock("text", block_type_paragraph, ["text"]),
+        ]
+        self.assertEqual((expected, "Title"), scan_markdown(input))
+
+    def test_scan_markdown_matches_block_functions(self):
+        input = """    # First block
+        
+        # Second block     
+        
+                * third block
+* is a list
+* with both leading and trailing whitespace         \n"""
+        scanned_blocks, _ = scan_markdown(input)
+        self.assertEqual(markdown_to_blocks(input), [scanned_block.text for scanned_block in scanned_blocks])
+        self.assertEqual([block_to_block_type(block) for block in markdown_to_blocks(input)], [scanned_block.block_type for scanned_block in scanned_blocks])
+
+    def test_scan_markdown_title_not_first(self):
+        self.assertEqual("Header", scan_markdown("##Something in front\n\n## h2\n\n#   Header  \nsecond line")[1].rstrip())
+        self.assertIsNone(scan_markdown("## only h2\n\ntext")[1])
+
+    def test_scan_markdown_empty_quote_line(self):
+        self.assertEqual(["a\nb"], scan_markdown(">a\n>\n>  b")[0][0].inline_texts)
+
+    def test_scan_markdown_carriage_returns(self):
+        input = "# Title\r\n\r\n> quote\r\n> more"
+        self.assertEqual(scan_markdown_legacy(input), scan_markdown(input))
+        # markdown_to_blocks reads a lone \r\n as a line break followed by an empty line
+        self.assertEqual("<div><h1>Title</h1><blockquote>quote</blockquote><blockquote>more</blockquote></div>", markdown_to_html_node(input).to_html())
+
+    def test_parse_markdown(self):
+        html_node, title = parse_markdown("## Intro\n\n# Main *title*\n\ntext")
+        self.assertEqual("Main *title*", title)
+        self.assertEqual("<div><h2>Intro</h2><h1>Main <i>title</i></h1><p>text</p></div>", html_node.to_html())
+        self.assertIsNone(parse_markdown("text")[1])
+
+    def test_iter_markdown_blocks(self):
+        input = "  # Title  \n \t\n\n* a\n* b\n\n\n```\ncode\n```\n   "
+        self.assertEqual(markdown_to_blocks(input), list(iter_markdown_blocks(io.StringIO(input))))
+
+    def test_render_blocks_to(self):
+        input = "## Intro\n\n# Main *title*\n\n> quote\n\ntext"
+        stream = io.StringIO()
+        render_blocks_to(iter_scanned_blocks(io.StringIO(input)), stream)
+        self.assertEqual(markdown_to_html_node(input).to_html(), stream.getvalue())
+        self.assertEqual("Main *title*", find_title(iter_scanned_blocks(io.StringIO(input))))
+        with self.assertRaises(ValueError):
+            render_blocks_to(iter_scanned_blocks(io.StringIO("\n\n")), io.StringIO())
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
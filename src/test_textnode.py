@@ -31,6 +31,12 @@ class TestTextNode(unittest.TestCase):
         str_repr = "TextNode(This is a text node, bold, github.com)"
         self.assertEqual(node.__repr__(), str_repr)
 
+    def test_slots(self):
+        node = TextNode("This is a text node", "bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = "value"
+
     def test_text_to_html_raw(self):
         node = TextNode("This is text", "text")
         ref_node = LeafNode("This is text")
@@ -2,6 +2,7 @@ import re
 
 from textnode import *
 from htmlnode import LeafNode, ParentNode
+from instrument import null_timer
 
 block_type_paragraph = "paragraph"
 block_type_code = "code"
@@ -72,9 +73,52 @@ def split_nodes_link(old_nodes):
             result.append(TextNode(remainder_text, text_type_text))
     return result
 
-def text_to_textnodes(text):
+def text_to_textnodes_legacy(text):
     return split_nodes_delimiter(split_nodes_delimiter(split_nodes_delimiter(split_nodes_image(split_nodes_link([TextNode(text, text_type_text)])), "**", text_type_bold), "*", text_type_italic), "`", text_type_code)
 
+image_pattern = re.compile(r"!\[(.*?)\]\((.*?)\)")
+link_pattern = re.compile(r"(?<!!)\[(.*?)\]\((.*?)\)")
+inline_delimiters = (("**", text_type_bold), ("*", text_type_italic), ("`", text_type_code))
+
+def split_text_delimiters(text, result, level=0):
+    # same splitting rules as the chained split_nodes_delimiter calls, applied to one plain text run
+    delimiter, text_type = inline_delimiters[level]
+    split_text = text.split(delimiter)
+    if len(split_text) % 2 != 1:
+        raise Exception(f"Invalid Markdown syntax: Missing delimiter {delimiter} in {text}")
+    for id, part in enumerate(split_text):
+        if part == "":
+            continue
+        if id % 2 == 1:
+            result.append(TextNode(part, text_type))
+        elif level + 1 < len(inline_delimiters):
+            split_text_delimiters(part, result, level + 1)
+        else:
+            result.append(TextNode(part, text_type_text))
+
+def text_to_textnodes(text, legacy=False):
+    if legacy:
+        return text_to_textnodes_legacy(text)
+    # Single left to right scan. Links take precedence over images, just like split_nodes_link running first:
+    # images are only searched for in the text before the next link.
+    result = []
+    pos = 0
+    while pos < len(text):
+        link_match = link_pattern.search(text, pos)
+        link_start = link_match.start() if link_match else len(text)
+        for image_match in image_pattern.finditer(text, pos, link_start):
+            if image_match.start() > pos:
+                split_text_delimiters(text[pos:image_match.start()], result)
+            result.append(TextNode(image_match.group(1), text_type_image, image_match.group(2)))
+            pos = image_match.end()
+        if link_start > pos:
+            split_text_delimiters(text[pos:link_start], result)
+        if link_match is None:
+            break
+        result.append(TextNode(link_match.group(1), text_type_link, link_match.group(2)))
+        pos = link_match.end()
+    return result
+
 def markdown_to_blocks(markdown):
     result = []
     blocks = re.split(r"(\r\n|\r|\n)([ \t]*(\r\n|\r|\n))+", markdown)
@@ -110,51 +154,210 @@ def block_to_block_type(markdown_block):
             return block_type_paragraph
     return block_type_ordered_list
 
-def markdown_to_html_node(markdown):
-    markdown_blocks = markdown_to_blocks(markdown)
+def markdown_to_html_node(markdown, timer=null_timer, cache=None, assets=None):
+    return parse_markdown(markdown, timer, cache, assets)[0]
+
+def parse_markdown(markdown, timer=null_timer, cache=None, assets=None):
+    # returns the html tree and the title (None without a # heading) from a single scan of the document
+    # timer gets a lap per stage, with a BlockCache every block is rendered once and kept as a raw html leaf
+    scanned_blocks, title = scan_markdown(markdown)
+    timer.lap("blocks")
     root_node = ParentNode(tag="div", children=[])
-    for block in markdown_blocks:
-        block_type = block_to_block_type(block)
-        block_node = None
-        if block_type == block_type_paragraph:
-            children_nodes = text_to_html_nodes(block)
-            block_node = ParentNode(tag="p", children=children_nodes)
-        elif block_type == block_type_code:
-            children_nodes = text_to_html_nodes(block.strip("`"))
-            code_node = ParentNode(tag="code", children=children_nodes)
-            block_node = ParentNode(tag="pre", children=[code_node])
-        elif block_type == block_type_quote:
-            stripped_text = re.sub(r"^>\s*", "", block, flags=re.MULTILINE)
-            children_nodes = text_to_html_nodes(stripped_text)
-            block_node = ParentNode(tag="blockquote", children=children_nodes)
-        elif block_type == block_type_heading:
-            stripped_text = re.sub(r"^#+ ", "", block, count=1)
-            header_level = len(block) - len(stripped_text) - 1
-            children_nodes = text_to_html_nodes(stripped_text)
-            block_node = ParentNode(tag=f"h{header_level}", children=children_nodes)
-        elif block_type == block_type_unordered_list:
-            stripped_lines = re.sub(r"^[*-] ", "", block, flags=re.MULTILINE).splitlines()
-            block_node = ParentNode(tag="ul", children=[])
-            for line in stripped_lines:
-                list_item_nodes = text_to_html_nodes(line)
-                block_node.children.append(ParentNode(tag="li", children=list_item_nodes))
-        elif block_type == block_type_ordered_list:
-            stripped_lines = re.sub(r"^\d+. ", "", block, flags=re.MULTILINE).splitlines()
-            block_node = ParentNode(tag="ol", children=[])
-            for line in stripped_lines:
-                list_item_nodes = text_to_html_nodes(line)
-                block_node.children.append(ParentNode(tag="li", children=list_item_nodes))
-        root_node.children.append(block_node)
-    return root_node
-
-def text_to_html_nodes(text):
+    for scanned_block in scanned_blocks:
+        if cache is None:
+            root_node.children.append(scanned_block_to_html_node(scanned_block, timer, assets))
+            continue
+        cache_key = scanned_block.text if assets is None else assets.cache_key(scanned_block.text)
+        html = cache.get(cache_key)
+        timer.lap("cache")
+        if html is None:
+            html = scanned_block_to_html_node(scanned_block, timer, assets).to_html()
+            cache.put(cache_key, html)
+            timer.lap("serialize")
+        root_node.children.append(LeafNode(html))
+    return root_node, title
+
+class ScannedBlock:
+    # a markdown block with its type, heading level and the marker free texts handed to the inline parser
+    __slots__ = ("text", "block_type", "level", "inline_texts")
+
+    def __init__(self, text, block_type, inline_texts, level=0) -> None:
+        self.text = text
+        self.block_type = block_type
+        self.inline_texts = inline_texts
+        self.level = level
+
+    def __eq__(self, other: object) -> bool:
+        return self.text == other.text and self.block_type == other.block_type and self.inline_texts == other.inline_texts and self.level == other.level
+
+    def __repr__(self) -> str:
+        return f"ScannedBlock({self.text}, {self.block_type}, {self.inline_texts}, {self.level})"
+
+# line breaks, other than \n, that the regex based functions and str.splitlines treat differently
+special_line_breaks = re.compile("[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+blank_lines_pattern = re.compile(r"\n(?:[ \t]*\n)+")
+
+def scan_markdown(markdown):
+    # One pass over the document: splits it into blocks, classifies each block from its lines while stripping
+    # its markers and remembers the first # heading. Gives the same result as markdown_to_blocks, block_to_block_type
+    # and extract_title, documents with unusual line breaks go through those functions instead.
+    if special_line_breaks.search(markdown):
+        return scan_markdown_legacy(markdown)
+    scanned_blocks = []
+    # blank lines hold only spaces and tabs, runs of them separate the blocks
+    for block in blank_lines_pattern.split(markdown):
+        block = block.strip()
+        if block:
+            scanned_blocks.append(scan_block(block, block.split("\n")))
+    return scanned_blocks, find_title(scanned_blocks)
+
+def scan_block(text, lines):
+    first_line = lines[0]
+    heading_level = len(first_line) - len(first_line.lstrip("#"))
+    if 1 <= heading_level <= 6 and first_line[heading_level:heading_level + 1] == " ":
+        return ScannedBlock(text, block_type_heading, [text[heading_level + 1:]], heading_level)
+    if len(text) >= 6 and text[:3] == "```" and text[-3:] == "```":
+        return ScannedBlock(text, block_type_code, [text.strip("`")])
+    if all(line[:1] == ">" for line in lines):
+        return ScannedBlock(text, block_type_quote, [strip_quote_lines(lines)])
+    if all(line[:2] == "* " or line[:2] == "- " for line in lines):
+        return ScannedBlock(text, block_type_unordered_list, [line[2:] for line in lines])
+    if all(line[:3] == f"{number}. " for number, line in enumerate(lines, 1)):
+        return ScannedBlock(text, block_type_ordered_list, [line[3:] for line in lines])
+    return ScannedBlock(text, block_type_paragraph, [text])
+
+def scanned_block_title(scanned_block):
+    # the text after "# " up to the end of the line, like extract_title's r"^# \s*(.*)"
+    if scanned_block.block_type == block_type_heading and scanned_block.level == 1:
+        return scanned_block.text[2:].lstrip().split("\n", 1)[0]
+    return None
+
+def iter_markdown_blocks(lines):
+    # Yields the same blocks as markdown_to_blocks from an iterable of lines, e.g. a file opened in text mode,
+    # so only one block is held in memory. Expects \n line endings, which universal newlines mode provides.
+    block_lines = []
+    for line in lines:
+        if line[-1:] == "\n":
+            line = line[:-1]
+        if line.strip(" \t"):
+            block_lines.append(line)
+            continue
+        if block_lines:
+            block = "\n".join(block_lines).strip()
+            block_lines = []
+            if block:
+                yield block
+    if block_lines:
+        block = "\n".join(block_lines).strip()
+        if block:
+            yield block
+
+def iter_scanned_blocks(lines):
+    for block in iter_markdown_blocks(lines):
+        if special_line_breaks.search(block):
+            # block_to_block_type splits lines with str.splitlines, which knows more line breaks than \n
+            yield scan_block_legacy(block)
+        else:
+            yield scan_block(block, block.split("\n"))
+
+def find_title(scanned_blocks):
+    for scanned_block in scanned_blocks:
+        title = scanned_block_title(scanned_block)
+        if title is not None:
+            return title
+    return None
+
+def render_blocks_to(scanned_blocks, stream, cache=None, assets=None):
+    # writes the same html as markdown_to_html_node(...).render_to, one block at a time
+    stream.write("<div>")
+    empty = True
+    for scanned_block in scanned_blocks:
+        empty = False
+        if cache is None:
+            scanned_block_to_html_node(scanned_block, assets=assets).render_to(stream)
+            continue
+        cache_key = scanned_block.text if assets is None else assets.cache_key(scanned_block.text)
+        html = cache.get(cache_key)
+        if html is None:
+            html = scanned_block_to_html_node(scanned_block, assets=assets).to_html()
+            cache.put(cache_key, html)
+        stream.write(html)
+    if empty:
+        raise ValueError("ParentNode requires at least one child")
+    stream.write("</div>")
+
+def strip_quote_lines(lines):
+    # like re.sub(r"^>\s*", "", block, flags=re.MULTILINE): \s* also eats the line break of an empty quote line
+    stripped_lines = []
+    last = len(lines) - 1
+    for number, line in enumerate(lines):
+        stripped_line = line[1:].lstrip()
+        if stripped_line or number == last:
+            stripped_lines.append(stripped_line)
+            stripped_lines.append("\n")
+        # an empty quote line contributes neither text nor a line break
+    if stripped_lines:
+        stripped_lines.pop()
+    return "".join(stripped_lines)
+
+def scan_markdown_legacy(markdown):
+    scanned_blocks = [scan_block_legacy(block) for block in markdown_to_blocks(markdown)]
+    title = None
+    for scanned_block in scanned_blocks:
+        if scanned_block.block_type == block_type_heading:
+            if matched_heading := re.search(r"^# \s*(.*)", scanned_block.text):
+                title = matched_heading.group(1)
+                break
+    return scanned_blocks, title
+
+def scan_block_legacy(block):
+    block_type = block_to_block_type(block)
+    if block_type == block_type_code:
+        return ScannedBlock(block, block_type, [block.strip("`")])
+    if block_type == block_type_quote:
+        return ScannedBlock(block, block_type, [re.sub(r"^>\s*", "", block, flags=re.MULTILINE)])
+    if block_type == block_type_heading:
+        stripped_text = re.sub(r"^#+ ", "", block, count=1)
+        return ScannedBlock(block, block_type, [stripped_text], len(block) - len(stripped_text) - 1)
+    if block_type == block_type_unordered_list:
+        return ScannedBlock(block, block_type, re.sub(r"^[*-] ", "", block, flags=re.MULTILINE).splitlines())
+    if block_type == block_type_ordered_list:
+        return ScannedBlock(block, block_type, re.sub(r"^\d+. ", "", block, flags=re.MULTILINE).splitlines())
+    return ScannedBlock(block, block_type, [block])
+
+def scanned_block_to_html_node(scanned_block, timer=null_timer, assets=None):
+    block_type = scanned_block.block_type
+    block_node = None
+    if block_type == block_type_paragraph:
+        children_nodes = text_to_html_nodes(scanned_block.inline_texts[0], timer, assets)
+        block_node = ParentNode(tag="p", children=children_nodes)
+    elif block_type == block_type_code:
+        children_nodes = text_to_html_nodes(scanned_block.inline_texts[0], timer, assets)
+        code_node = ParentNode(tag="code", children=children_nodes)
+        block_node = ParentNode(tag="pre", children=[code_node])
+    elif block_type == block_type_quote:
+        children_nodes = text_to_html_nodes(scanned_block.inline_texts[0], timer, assets)
+        block_node = ParentNode(tag="blockquote", children=children_nodes)
+    elif block_type == block_type_heading:
+        children_nodes = text_to_html_nodes(scanned_block.inline_texts[0], timer, assets)
+        block_node = ParentNode(tag=f"h{scanned_block.level}", children=children_nodes)
+    elif block_type == block_type_unordered_list or block_type == block_type_ordered_list:
+        block_node = ParentNode(tag="ul" if block_type == block_type_unordered_list else "ol", children=[])
+        for line in scanned_block.inline_texts:
+            list_item_nodes = text_to_html_nodes(line, timer, assets)
+            block_node.children.append(ParentNode(tag="li", children=list_item_nodes))
+    timer.lap("tree")
+    return block_node
+
+def text_to_html_nodes(text, timer=null_timer, assets=None):
     textnodes = text_to_textnodes(text)
-    return [text_node_to_html_node(node) for node in textnodes]
+    timer.lap("inline")
+    html_nodes = [text_node_to_html_node(node, assets) for node in textnodes]
+    timer.lap("tree")
+    return html_nodes
 
 def extract_title(markdown):
-    markdown_blocks = markdown_to_blocks(markdown)
-    for block in markdown_blocks:
-        if block_type_heading == block_to_block_type(block):
-            if matched_heading := re.search(r"^# \s*(.*)", block):
-                return matched_heading.group(1)
-    raise Exception("No valid <h1>/# Header found")
\ No newline at end of file
+    title = scan_markdown(markdown)[1]
+    if title is None:
+        raise Exception("No valid <h1>/# Header found")
+    return title
\ No newline at end of file
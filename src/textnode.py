@@ -8,6 +8,7 @@ text_type_image = "image"
 text_type_link = "link"
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
 
     def __init__(self, text, text_type, url=None):
         self.text = text
@@ -21,7 +22,8 @@ class TextNode:
     def __repr__(self) -> str:
         return f"TextNode({self.text}, {self.text_type}, {self.url})"
     
-def text_node_to_html_node(textnode):
+def text_node_to_html_node(textnode, assets=None):
+    # assets, if given, rewrites the urls of links and images, see assets.Assets
     if textnode.text_type:
         if textnode.text_type.lower() == text_type_text:
             return LeafNode(textnode.text)
@@ -32,8 +34,10 @@ def text_node_to_html_node(textnode):
         if textnode.text_type.lower() == text_type_code:
             return LeafNode(textnode.text, tag="code")
         if textnode.text_type.lower() == text_type_link:
-            return LeafNode(textnode.text, tag="a", props={"href": textnode.url})
+            return LeafNode(textnode.text, tag="a", props={"href": textnode.url if assets is None else assets.url(textnode.url)})
         if textnode.text_type.lower() == text_type_image:
+            if assets is not None:
+                return LeafNode("", tag="img", props=assets.image_props(textnode.url, textnode.text))
             return LeafNode("", tag="img", props={"src": textnode.url, "alt": textnode.text})
         
 